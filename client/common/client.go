@@ -6,6 +6,7 @@ import (
 	"net"
 	"os"
 	"os/signal"
+	"strings"
 	"sync"
 	"syscall"
 	"time"
@@ -21,6 +22,8 @@ type ClientConfig struct {
 	ServerAddress string
 	LoopAmount    int
 	LoopPeriod    time.Duration
+	Streams       int
+	AdaptiveBatch bool
 }
 
 // Client Entity that encapsulates how
@@ -31,6 +34,7 @@ type Client struct {
 	ctx    context.Context
 	cancel context.CancelFunc
 	protocol *Protocol
+	streamConns map[net.Conn]struct{}
 }
 
 // NewClient Initializes a new client receiving the configuration
@@ -42,6 +46,7 @@ func NewClient(config ClientConfig) *Client {
 		ctx:    ctx,
 		cancel: cancel,
 		protocol: NewProtocol(),
+		streamConns: make(map[net.Conn]struct{}),
 	}
 	return client
 }
@@ -53,7 +58,7 @@ func (c *Client) createClientSocket() error {
 	c.mu.Lock()
 	defer c.mu.Unlock()
 	
-	conn, err := net.Dial("tcp", c.config.ServerAddress)
+	conn, err := dialServer(c.config.ServerAddress)
 	if err != nil {
 		log.Criticalf(
 			"action: connect | result: fail | client_id: %v | error: %v",
@@ -89,6 +94,14 @@ func (c *Client) gracefulShutdown() {
 	// Close client socket
 	c.closeClientSocket()
 	
+	// Close upload streams
+	c.mu.Lock()
+	for conn := range c.streamConns {
+		conn.Close()
+	}
+	c.streamConns = make(map[net.Conn]struct{})
+	c.mu.Unlock()
+	
 	log.Info("action: graceful_shutdown | result: success")
 }
 
@@ -248,7 +261,7 @@ func (c *Client) queryWinnersWithRetry() ([]string, error) {
 		}
 		
 		// Recibir respuesta
-		msgType, _, err := c.protocol.ReceiveMessage(c.conn)
+		msgType, payload, err := c.protocol.ReceiveMessage(c.conn)
 		if err != nil {
 			log.Errorf("action: receive_winners_response | result: fail | client_id: %v | attempt: %d | error: %v",
 				c.config.ID, attempt, err)
@@ -256,28 +269,11 @@ func (c *Client) queryWinnersWithRetry() ([]string, error) {
 			return nil, err
 		}
 		
-		c.closeClientSocket()
-		
 		// Procesar respuesta según el tipo
 		switch msgType {
-		case MSG_WINNERS_RESPONSE:
-			// Recrear conexión para recibir el payload completo
-			if err := c.createClientSocket(); err != nil {
-				log.Errorf("action: create_socket_for_winners_payload | result: fail | client_id: %v | error: %v",
-					c.config.ID, err)
-				return nil, err
-			}
-			
-			// Enviar consulta nuevamente para recibir el payload
-			if err := c.protocol.SendWinnersQuery(c.conn, c.config.ID); err != nil {
-				log.Errorf("action: send_winners_query_payload | result: fail | client_id: %v | error: %v",
-					c.config.ID, err)
-				c.closeClientSocket()
-				return nil, err
-			}
-			
-			// Recibir respuesta completa
-			success, ganadores, err := c.protocol.ReceiveWinnersResponse(c.conn)
+		case MSG_WINNERS_CHUNK, MSG_WINNERS_END:
+			// Los ganadores llegan en chunks por la misma conexión
+			ganadores, err := c.protocol.ReceiveWinnersStream(c.conn, msgType, payload)
 			c.closeClientSocket()
 			
 			if err != nil {
@@ -286,16 +282,13 @@ func (c *Client) queryWinnersWithRetry() ([]string, error) {
 				return nil, err
 			}
 			
-			if success {
-				log.Infof("action: consulta_ganadores | result: success | cant_ganadores: %d | attempts: %d", 
-					len(ganadores), attempt)
-				return ganadores, nil
-			} else {
-				log.Errorf("action: consulta_ganadores | result: fail | attempt: %d", attempt)
-				return nil, fmt.Errorf("consulta de ganadores falló")
-			}
+			log.Infof("action: consulta_ganadores | result: success | cant_ganadores: %d | attempts: %d", 
+				len(ganadores), attempt)
+			return ganadores, nil
 			
 		case MSG_RETRY:
+			c.closeClientSocket()
+			
 			// Recrear conexión para recibir el payload del mensaje de retry
 			if err := c.createClientSocket(); err != nil {
 				log.Errorf("action: create_socket_for_retry | result: fail | client_id: %v | error: %v",
@@ -335,6 +328,7 @@ func (c *Client) queryWinnersWithRetry() ([]string, error) {
 			}
 			
 		default:
+			c.closeClientSocket()
 			log.Errorf("action: unknown_message_type | result: fail | client_id: %v | type: %d | attempt: %d",
 				c.config.ID, msgType, attempt)
 			return nil, fmt.Errorf("tipo de mensaje inesperado: %d", msgType)
@@ -349,119 +343,203 @@ func (c *Client) StartBatchProcessing(bets []Bet, maxBatchSize int) {
 	c.setupSignalHandlers()
 	
 	log.Info("action: batch_processing_start | result: success")
+
+	// Repartir las apuestas en streams contiguos, cada uno con su propia conexión
+	streams := c.config.Streams
+	if streams < 1 {
+		streams = 1
+	}
+	if len(bets) > 0 && streams > len(bets) {
+		streams = len(bets)
+	}
+
+	var wg sync.WaitGroup
+	results := make([]bool, streams)
+	for s := 0; s < streams; s++ {
+		start := s * len(bets) / streams
+		end := (s + 1) * len(bets) / streams
+		wg.Add(1)
+		go func(index int, part []Bet) {
+			defer wg.Done()
+			results[index] = c.uploadStream(part, maxBatchSize, index, streams)
+		}(s, bets[start:end])
+	}
+	wg.Wait()
+
+	for _, ok := range results {
+		if !ok {
+			return
+		}
+	}
 	
-	// Crear conexión TCP
-	if err := c.createClientSocket(); err != nil {
-		log.Errorf("action: connect | result: fail | client_id: %v | error: %v",
-			c.config.ID,
-			err,
-		)
+	// Consultar ganadores de la agencia con retry automático
+	ganadores, err := c.queryWinnersWithRetry()
+	if err != nil {
+		log.Errorf("action: consulta_ganadores | result: fail | client_id: %v | error: %v",
+			c.config.ID, err)
 		return
 	}
-	defer c.closeClientSocket()
+	
+	log.Infof("action: consulta_ganadores | result: success | cant_ganadores: %d", len(ganadores))
+}
+
+// uploadStream envía una porción de las apuestas por una conexión propia y
+// notifica al servidor la finalización del stream
+func (c *Client) uploadStream(bets []Bet, maxBatchSize int, index int, count int) bool {
+	conn, err := c.openStream()
+	if err != nil {
+		return false
+	}
+	defer func() { c.closeStream(conn) }()
 
 	totalBets := len(bets)
 	processedBets := 0
+	batchLimit := maxBatchSize
 
 	// Procesar apuestas en batches
-	for i := 0; i < totalBets; i += maxBatchSize {
+	for i, end := 0, 0; i < totalBets; i = end {
 		// Check if shutdown was requested
 		select {
 		case <-c.ctx.Done():
 			log.Info("action: batch_processing | result: interrupted")
-			return
+			return false
 		default:
 			// Continue with normal operation
 		}
 		
-		end := i + maxBatchSize
-		if end > totalBets {
-			end = totalBets
-		}
-
+		end = c.batchEnd(bets, i, batchLimit)
 		batch := bets[i:end]
 		batchSize := len(batch)
 
-		// Enviar batch
-		err := c.protocol.SendBatch(c.conn, batch)
+		// Enviar batch y recibir respuesta
+		success, recommended, err := c.sendBatch(conn, batch)
 		if err != nil {
-			log.Errorf("action: send_batch | result: fail | client_id: %v | batch: %d-%d | error: %v",
-				c.config.ID, i+1, end, err,
+			// El servidor pudo haber cerrado la conexión (p.ej. durante un handoff):
+			// se reconecta una vez y se reenvía el mismo batch
+			log.Infof("action: reconnect | result: in_progress | client_id: %v | stream: %d | batch: %d-%d | error: %v",
+				c.config.ID, index, i+1, end, err,
 			)
-			continue
+			c.closeStream(conn)
+			if conn, err = c.openStream(); err != nil {
+				return false
+			}
+			success, recommended, err = c.sendBatch(conn, batch)
 		}
-
-		// Recibir respuesta
-		success, _, _, err := c.protocol.ReceiveResponse(c.conn)
 		if err != nil {
-			log.Errorf("action: receive_batch_response | result: fail | client_id: %v | batch: %d-%d | error: %v",
-				c.config.ID, i+1, end, err,
+			log.Errorf("action: send_batch | result: fail | client_id: %v | stream: %d | batch: %d-%d | error: %v",
+				c.config.ID, index, i+1, end, err,
 			)
 			continue
 		}
 
+		// Adoptar el tamaño de batch que recomienda el servidor
+		if c.config.AdaptiveBatch && recommended > 0 && recommended != batchLimit {
+			log.Debugf("action: batch_size | result: success | client_id: %v | stream: %d | size: %d->%d",
+				c.config.ID, index, batchLimit, recommended,
+			)
+			batchLimit = recommended
+		}
+
 		if success {
 			processedBets += batchSize
-			log.Infof("action: batch_processed | result: success | client_id: %v | batch: %d-%d | cantidad: %d",
-				c.config.ID, i+1, end, batchSize,
+			log.Infof("action: batch_processed | result: success | client_id: %v | stream: %d | batch: %d-%d | cantidad: %d",
+				c.config.ID, index, i+1, end, batchSize,
 			)
 		} else {
-			log.Errorf("action: batch_processed | result: fail | client_id: %v | batch: %d-%d | cantidad: %d",
-				c.config.ID, i+1, end, batchSize,
+			log.Errorf("action: batch_processed | result: fail | client_id: %v | stream: %d | batch: %d-%d | cantidad: %d",
+				c.config.ID, index, i+1, end, batchSize,
 			)
 		}
 	}
 
-	log.Infof("action: batch_processing_complete | result: success | client_id: %v | processed: %d/%d",
-		c.config.ID, processedBets, totalBets,
+	log.Infof("action: batch_processing_complete | result: success | client_id: %v | stream: %d/%d | processed: %d/%d",
+		c.config.ID, index, count, processedBets, totalBets,
 	)
 	
-	// Cerrar conexión antes de notificar finalización
-	c.closeClientSocket()
-	
-	// Notificar al servidor que se finalizó el envío de apuestas
-	if err := c.createClientSocket(); err != nil {
-		log.Errorf("action: create_socket_for_notification | result: fail | client_id: %v | error: %v",
-			c.config.ID, err)
-		return
-	}
-	
-	if err := c.protocol.SendFinishedNotification(c.conn, c.config.ID); err != nil {
-		log.Errorf("action: send_finished_notification | result: fail | client_id: %v | error: %v",
-			c.config.ID, err,
+	// Notificar al servidor que este stream finalizó el envío de apuestas
+	if err := c.protocol.SendStreamFinishedNotification(conn, c.config.ID, index, count); err != nil {
+		log.Errorf("action: send_finished_notification | result: fail | client_id: %v | stream: %d | error: %v",
+			c.config.ID, index, err,
 		)
-		c.closeClientSocket()
-		return
+		return false
 	}
 	
 	// Recibir confirmación de notificación (respuesta simple)
-	msgType, _, err := c.protocol.ReceiveMessage(c.conn)
+	msgType, _, err := c.protocol.ReceiveMessage(conn)
 	if err != nil {
-		log.Errorf("action: receive_finished_ack | result: fail | client_id: %v | error: %v",
-			c.config.ID, err,
+		log.Errorf("action: receive_finished_ack | result: fail | client_id: %v | stream: %d | error: %v",
+			c.config.ID, index, err,
 		)
-		c.closeClientSocket()
-		return
+		return false
 	}
 	
-	success := msgType == MSG_SUCCESS
-	if success {
-		log.Infof("action: finished_notification | result: success | client_id: %v", c.config.ID)
-	} else {
-		log.Errorf("action: finished_notification | result: fail | client_id: %v", c.config.ID)
-		c.closeClientSocket()
-		return
+	if msgType != MSG_SUCCESS {
+		log.Errorf("action: finished_notification | result: fail | client_id: %v | stream: %d", c.config.ID, index)
+		return false
 	}
-	
-	c.closeClientSocket()
-	
-	// Consultar ganadores de la agencia con retry automático
-	ganadores, err := c.queryWinnersWithRetry()
+	log.Infof("action: finished_notification | result: success | client_id: %v | stream: %d", c.config.ID, index)
+	return true
+}
+
+// dialServer conecta con el servidor por TCP, o por su socket Unix si la
+// dirección tiene la forma "unix:/path" (agencias en el mismo host)
+func dialServer(address string) (net.Conn, error) {
+	if path := strings.TrimPrefix(address, "unix:"); path != address {
+		return net.Dial("unix", path)
+	}
+	return net.Dial("tcp", address)
+}
+
+// openStream abre una conexión de upload y la registra para el cierre graceful
+func (c *Client) openStream() (net.Conn, error) {
+	conn, err := dialServer(c.config.ServerAddress)
 	if err != nil {
-		log.Errorf("action: consulta_ganadores | result: fail | client_id: %v | error: %v",
-			c.config.ID, err)
-		return
+		log.Criticalf(
+			"action: connect | result: fail | client_id: %v | error: %v",
+			c.config.ID,
+			err,
+		)
+		return nil, err
 	}
-	
-	log.Infof("action: consulta_ganadores | result: success | cant_ganadores: %d", len(ganadores))
+
+	c.mu.Lock()
+	c.streamConns[conn] = struct{}{}
+	c.mu.Unlock()
+	return conn, nil
+}
+
+// closeStream cierra una conexión de upload
+func (c *Client) closeStream(conn net.Conn) {
+	c.mu.Lock()
+	defer c.mu.Unlock()
+
+	if _, ok := c.streamConns[conn]; ok {
+		delete(c.streamConns, conn)
+		conn.Close()
+	}
+}
+
+// sendBatch envía un batch por la conexión y espera su confirmación junto con
+// el tamaño de batch recomendado por el servidor
+func (c *Client) sendBatch(conn net.Conn, batch []Bet) (bool, int, error) {
+	if err := c.protocol.SendBatch(conn, batch); err != nil {
+		return false, 0, err
+	}
+	return c.protocol.ReceiveBatchResponse(conn)
+}
+
+// batchEnd retorna el fin del batch que empieza en 'start': como máximo
+// 'limit' apuestas y sin superar MAX_MESSAGE_SIZE una vez codificado
+func (c *Client) batchEnd(bets []Bet, start int, limit int) int {
+	size := 4
+	end := start
+	for end < len(bets) && end-start < limit {
+		betSize := c.protocol.EncodedBetSize(bets[end])
+		if end > start && size+betSize > MAX_MESSAGE_SIZE {
+			break
+		}
+		size += betSize
+		end++
+	}
+	return end
 }
@@ -23,6 +23,8 @@ const (
 	MSG_WINNERS_QUERY   = 0x06
 	MSG_WINNERS_RESPONSE = 0x07
 	MSG_RETRY           = 0x08
+	MSG_WINNERS_CHUNK   = 0x09
+	MSG_WINNERS_END     = 0x0A
 )
 
 // Bet representa una apuesta de quiniela
@@ -171,6 +173,13 @@ func (p *Protocol) EncodeBet(bet Bet) []byte {
 	return payload
 }
 
+// EncodedBetSize retorna cuántos bytes ocupa la apuesta dentro de un batch
+// (sus seis strings con longitud más los 4 bytes de longitud de la apuesta)
+func (p *Protocol) EncodedBetSize(bet Bet) int {
+	return 4 + 6*2 + len(bet.Agency) + len(bet.Nombre) + len(bet.Apellido) +
+		len(bet.DNI) + len(bet.Nacimiento) + len(bet.Numero)
+}
+
 // DecodeBet decodifica una apuesta desde el payload
 func (p *Protocol) DecodeBet(payload []byte) (Bet, error) {
 	var bet Bet
@@ -260,45 +269,68 @@ func (p *Protocol) SendFinishedNotification(conn net.Conn, agencyID string) erro
 	return p.SendMessage(conn, MSG_FINISHED, payload)
 }
 
+// SendStreamFinishedNotification notifica la finalización de uno de los
+// streams de upload de la agencia (índice y cantidad total de streams)
+func (p *Protocol) SendStreamFinishedNotification(conn net.Conn, agencyID string, index int, count int) error {
+	payload := p.encodeString(agencyID)
+	streamInfo := make([]byte, 4)
+	binary.BigEndian.PutUint16(streamInfo[0:2], uint16(index))
+	binary.BigEndian.PutUint16(streamInfo[2:4], uint16(count))
+	payload = append(payload, streamInfo...)
+	return p.SendMessage(conn, MSG_FINISHED, payload)
+}
+
 // SendWinnersQuery envía consulta de ganadores al servidor
 func (p *Protocol) SendWinnersQuery(conn net.Conn, agencyID string) error {
 	payload := p.encodeString(agencyID)
 	return p.SendMessage(conn, MSG_WINNERS_QUERY, payload)
 }
 
-// ReceiveWinnersResponse recibe la respuesta con los ganadores del servidor
-func (p *Protocol) ReceiveWinnersResponse(conn net.Conn) (bool, []string, error) {
-	msgType, payload, err := p.ReceiveMessage(conn)
-	if err != nil {
-		return false, nil, fmt.Errorf("error recibiendo respuesta de ganadores: %v", err)
+// ReceiveWinnersStream lee la respuesta de ganadores enviada como una secuencia
+// de MSG_WINNERS_CHUNK terminada por MSG_WINNERS_END. Recibe el tipo y payload
+// del primer mensaje, ya leído por el llamador
+func (p *Protocol) ReceiveWinnersStream(conn net.Conn, msgType byte, payload []byte) ([]string, error) {
+	ganadores := make([]string, 0)
+	
+	for msgType == MSG_WINNERS_CHUNK {
+		// Leer cantidad de ganadores del chunk (4 bytes)
+		if len(payload) < 4 {
+			return nil, fmt.Errorf("datos insuficientes para decodificar cantidad de ganadores")
+		}
+		cantidad := binary.BigEndian.Uint32(payload[0:4])
+		offset := 4
+		
+		// Leer cada DNI ganador
+		for i := uint32(0); i < cantidad; i++ {
+			dni, newOffset, err := p.decodeString(payload, offset)
+			if err != nil {
+				return nil, fmt.Errorf("error decodificando DNI ganador %d: %v", len(ganadores)+1, err)
+			}
+			ganadores = append(ganadores, dni)
+			offset = newOffset
+		}
+		
+		var err error
+		msgType, payload, err = p.ReceiveMessage(conn)
+		if err != nil {
+			return nil, fmt.Errorf("error recibiendo chunk de ganadores: %v", err)
+		}
 	}
 	
-	if msgType != MSG_WINNERS_RESPONSE {
-		return false, nil, fmt.Errorf("tipo de mensaje inesperado: %d", msgType)
+	if msgType != MSG_WINNERS_END {
+		return nil, fmt.Errorf("tipo de mensaje inesperado: %d", msgType)
 	}
-	
-	// Decodificar respuesta de ganadores
-	offset := 0
-	
-	// Leer cantidad de ganadores (4 bytes)
-	if offset+4 > len(payload) {
-		return false, nil, fmt.Errorf("datos insuficientes para decodificar cantidad de ganadores")
+	if len(payload) < 4 {
+		return nil, fmt.Errorf("datos insuficientes para decodificar total de ganadores")
 	}
-	cantidad := binary.BigEndian.Uint32(payload[offset : offset+4])
-	offset += 4
 	
-	// Leer cada DNI ganador
-	ganadores := make([]string, 0, cantidad)
-	for i := uint32(0); i < cantidad; i++ {
-		dni, newOffset, err := p.decodeString(payload, offset)
-		if err != nil {
-			return false, nil, fmt.Errorf("error decodificando DNI ganador %d: %v", i+1, err)
-		}
-		ganadores = append(ganadores, dni)
-		offset = newOffset
+	// Validar que se recibieron todos los ganadores anunciados
+	total := binary.BigEndian.Uint32(payload[0:4])
+	if int(total) != len(ganadores) {
+		return nil, fmt.Errorf("cantidad de ganadores inconsistente: %d recibidos, %d esperados", len(ganadores), total)
 	}
 	
-	return true, ganadores, nil
+	return ganadores, nil
 }
 
 // ReceiveRetryResponse recibe la respuesta de retry del servidor
@@ -322,6 +354,34 @@ func (p *Protocol) ReceiveRetryResponse(conn net.Conn) (string, error) {
 	return message, nil
 }
 
+// ReceiveBatchResponse recibe el ack de un batch junto con el tamaño de batch
+// que recomienda el servidor (0 si el ack no trae recomendación)
+func (p *Protocol) ReceiveBatchResponse(conn net.Conn) (bool, int, error) {
+	msgType, payload, err := p.ReceiveMessage(conn)
+	if err != nil {
+		return false, 0, fmt.Errorf("error recibiendo respuesta: %v", err)
+	}
+	
+	if msgType != MSG_SUCCESS && msgType != MSG_ERROR {
+		return false, 0, fmt.Errorf("tipo de mensaje inesperado: %d", msgType)
+	}
+	
+	// Saltear DNI y número de la primera apuesta del batch
+	offset := 0
+	if _, offset, err = p.decodeString(payload, offset); err != nil {
+		return false, 0, fmt.Errorf("error decodificando DNI en respuesta: %v", err)
+	}
+	if _, offset, err = p.decodeString(payload, offset); err != nil {
+		return false, 0, fmt.Errorf("error decodificando numero en respuesta: %v", err)
+	}
+	
+	recommended := 0
+	if offset+2 <= len(payload) {
+		recommended = int(binary.BigEndian.Uint16(payload[offset : offset+2]))
+	}
+	return msgType == MSG_SUCCESS, recommended, nil
+}
+
 // ReceiveResponse recibe la respuesta del servidor
 func (p *Protocol) ReceiveResponse(conn net.Conn) (bool, string, string, error) {
 	msgType, payload, err := p.ReceiveMessage(conn)
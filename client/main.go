@@ -37,6 +37,8 @@ func InitConfig() (*viper.Viper, error) {
 	v.BindEnv("loop", "period")
 	v.BindEnv("loop", "amount")
 	v.BindEnv("log", "level")
+	v.BindEnv("batch", "streams")
+	v.BindEnv("batch", "adaptive")
 	
 	// Variables de entorno para la apuesta (sin prefijo CLI_)
 	v.BindEnv("nombre")
@@ -115,6 +117,8 @@ func main() {
 		ID:            v.GetString("id"),
 		LoopAmount:    v.GetInt("loop.amount"),
 		LoopPeriod:    v.GetDuration("loop.period"),
+		Streams:       v.GetInt("batch.streams"),
+		AdaptiveBatch: v.GetBool("batch.adaptive"),
 	}
 
 	// Obtener configuración de batch
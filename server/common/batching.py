@@ -0,0 +1,82 @@
+import logging
+import threading
+import time
+
+
+class BatchSizeAdvisor:
+    """
+    Calcula el tamaño de batch que el server recomienda en cada ack de MSG_BATCH.
+
+    Cada ADJUST_INTERVAL segundos mira los batches procesados en la ventana:
+    el tamaño promedio de una apuesta codificada fija cuántas entran en un
+    frame de 'max_message_size' (con margen, porque las apuestas no miden
+    todas lo mismo). Sin sobrecarga la recomendación crece hacia ese tope,
+    que reparte el costo fijo de cada batch (ack, RTT, ronda del scheduler)
+    entre más apuestas. Si el procesamiento de un batch o la espera para
+    almacenarlo ('contention_fn') superan sus límites, la recomendación baja.
+    """
+
+    ADJUST_INTERVAL = 0.25
+    MIN_BATCH = 1
+    FRAME_HEADROOM = 0.9       # fracción del frame que se busca ocupar
+    LATENCY_LIMIT = 0.2        # 200ms procesando un batch
+    CONTENTION_LIMIT = 0.1     # 100ms esperando para almacenar
+    GROWTH = 1.25
+    BACKOFF = 0.75
+
+    def __init__(self, max_message_size: int, contention_fn=None):
+        self._max_message_size = max_message_size
+        self._contention_fn = contention_fn or (lambda: 0.0)
+        self._lock = threading.Lock()
+        self._recommended = 0  # 0: sin mediciones todavía
+        self._reset_window(time.monotonic())
+
+    def _reset_window(self, now: float):
+        self._window_start = now
+        self._batches = 0
+        self._bets = 0
+        self._bytes = 0
+        self._seconds = 0.0
+
+    def recommended(self) -> int:
+        """Tamaño de batch recomendado, o 0 si todavía no hay mediciones"""
+        with self._lock:
+            return self._recommended
+
+    def record(self, bets: int, payload_size: int, seconds: float):
+        """Registra un batch procesado: apuestas, bytes del payload y tiempo hasta el ack"""
+        now = time.monotonic()
+        with self._lock:
+            self._batches += 1
+            self._bets += bets
+            self._bytes += payload_size
+            self._seconds += seconds
+            if now - self._window_start < self.ADJUST_INTERVAL or not self._bets:
+                return
+            batches, avg_seconds = self._batches, self._seconds / self._batches
+            # Apuesta codificada sin su longitud ni la cantidad al inicio del payload
+            bet_bytes = (self._bytes - 4 * batches) / self._bets - 4
+            utilization = self._bytes / batches / self._max_message_size
+            self._reset_window(now)
+
+        # Fuera del lock: contention_fn puede tomar otros locks
+        self._adjust(batches, bet_bytes, avg_seconds, utilization, self._contention_fn())
+
+    def _adjust(self, batches: int, bet_bytes: float, avg_seconds: float, utilization: float, contention: float):
+        # Cada apuesta ocupa además 4 bytes de longitud; el payload empieza con 4 de cantidad
+        frame_cap = max(self.MIN_BATCH, int((self._max_message_size * self.FRAME_HEADROOM - 4) // (bet_bytes + 4)))
+        overloaded = avg_seconds > self.LATENCY_LIMIT or contention > self.CONTENTION_LIMIT
+
+        with self._lock:
+            current = self._recommended or frame_cap
+            if overloaded:
+                new = max(self.MIN_BATCH, int(current * self.BACKOFF))
+            else:
+                new = min(frame_cap, max(current + 1, int(current * self.GROWTH)))
+            new = min(new, frame_cap)
+            previous, self._recommended = self._recommended, new
+
+        if new != previous:
+            logging.info(f'action: batch_size_advice | result: success | size: {previous}->{new} | '
+                         f'frame_cap: {frame_cap} | batches: {batches} | frame_utilization: {utilization:.2f} | '
+                         f'batch_ms: {avg_seconds * 1000:.1f} | store_wait_ms: {contention * 1000:.1f}')
@@ -0,0 +1,72 @@
+import logging
+import threading
+
+
+class BufferPool:
+    """
+    Presupuesto de memoria global para los mensajes en vuelo.
+
+    Entrega buffers reutilizables de 'buffer_size' bytes mientras el total
+    prestado no supere 'budget' bytes. Con el presupuesto agotado, acquire
+    bloquea hasta que otra conexión libere un buffer: la conexión deja de
+    leer del socket y el cliente queda frenado por TCP en lugar de que el
+    server aloque más memoria. Los buffers liberados se reutilizan, así que
+    nunca hay más de 'budget // buffer_size' buffers alocados.
+    """
+
+    def __init__(self, budget: int, buffer_size: int):
+        self._buffer_size = buffer_size
+        # Al menos un buffer: con menos ninguna conexión podría avanzar
+        self._capacity = max(1, budget // buffer_size)
+        self._free = []
+        self._leased = 0
+        self._peak = 0
+        self._waiting = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+    @property
+    def buffer_size(self) -> int:
+        return self._buffer_size
+
+    def acquire(self) -> bytearray:
+        """Presta un buffer, esperando si el presupuesto está agotado"""
+        with self._cond:
+            if self._leased >= self._capacity and not self._closed:
+                self._waiting += 1
+                logging.debug(f'action: memory_budget | result: wait | in_use: {self._leased * self._buffer_size} | '
+                              f'waiting: {self._waiting}')
+                try:
+                    while self._leased >= self._capacity and not self._closed:
+                        self._cond.wait()
+                finally:
+                    self._waiting -= 1
+            if self._closed:
+                raise RuntimeError("buffer pool closed")
+
+            self._leased += 1
+            self._peak = max(self._peak, self._leased)
+            return self._free.pop() if self._free else bytearray(self._buffer_size)
+
+    def release(self, buffer: bytearray):
+        """Devuelve un buffer prestado por acquire"""
+        with self._cond:
+            self._leased -= 1
+            self._free.append(buffer)
+            self._cond.notify()
+
+    def close(self):
+        """Despierta a las conexiones que esperan presupuesto para que terminen"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def usage(self) -> dict:
+        """Bytes en uso, pico de uso, presupuesto total y conexiones esperando"""
+        with self._cond:
+            return {
+                'in_use': self._leased * self._buffer_size,
+                'peak': self._peak * self._buffer_size,
+                'budget': self._capacity * self._buffer_size,
+                'waiting': self._waiting,
+            }
@@ -0,0 +1,196 @@
+import logging
+import os
+import socket
+import struct
+import threading
+import time
+import weakref
+from .protocol import Protocol
+
+TRACE_MAGIC = b'TPCAP\x01'
+RECORD_HEADER = struct.Struct('!dQBI')  # timestamp, conexión, tipo, longitud del payload
+
+
+class TrafficRecorder:
+    """
+    Graba cada mensaje recibido por el server en un trace binario compacto.
+
+    Cada registro guarda el instante (epoch en segundos), un id de conexión,
+    el tipo y el payload del mensaje tal como llegó. Los ids se asignan por
+    socket e incluyen el pid, así dos conexiones nunca comparten id aunque el
+    sistema reutilice el file descriptor o el trace siga en el proceso nuevo
+    de un handoff, que agrega al mismo archivo.
+    """
+
+    def __init__(self, path: str):
+        self._path = path
+        self._file = open(path, 'ab')
+        if self._file.tell() == 0:
+            self._file.write(TRACE_MAGIC)
+        self._lock = threading.Lock()
+        self._conn_ids = weakref.WeakKeyDictionary()
+        self._next_conn_id = os.getpid() << 32
+        self._records = 0
+        logging.info(f'action: capture_start | result: success | file: {path}')
+
+    def record(self, sock: socket.socket, msg_type: int, payload) -> None:
+        timestamp = time.time()
+        with self._lock:
+            if self._file.closed:
+                return
+            conn_id = self._conn_ids.get(sock)
+            if conn_id is None:
+                conn_id = self._conn_ids[sock] = self._next_conn_id
+                self._next_conn_id += 1
+            self._file.write(RECORD_HEADER.pack(timestamp, conn_id, msg_type, len(payload)))
+            self._file.write(payload)
+            self._records += 1
+
+    def flush(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.flush()
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+                logging.info(f'action: capture_stop | result: success | records: {self._records} | file: {self._path}')
+
+
+def read_trace(path: str):
+    """Produce los registros del trace como (timestamp, conexión, tipo, payload)"""
+    with open(path, 'rb') as file:
+        if file.read(len(TRACE_MAGIC)) != TRACE_MAGIC:
+            raise ValueError(f"{path} is not a traffic capture")
+        while True:
+            header = file.read(RECORD_HEADER.size)
+            if len(header) < RECORD_HEADER.size:
+                # Un registro cortado al final (server terminado a la fuerza) se descarta
+                return
+            timestamp, conn_id, msg_type, length = RECORD_HEADER.unpack(header)
+            payload = file.read(length)
+            if len(payload) < length:
+                return
+            yield timestamp, conn_id, msg_type, payload
+
+
+class Replayer:
+    """
+    Reproduce un trace contra un server: una conexión por cada conexión grabada,
+    enviando sus mensajes en orden y esperando la respuesta de cada uno.
+
+    Con 'realtime' cada mensaje sale en el mismo instante relativo en que se
+    grabó (respetando la intercalación original entre agencias); si no, cada
+    conexión envía lo más rápido que el server responde. 'address' es
+    (host, puerto) para TCP o el path del listener Unix del server.
+    """
+
+    # Respuestas que cierran un pedido; los MSG_WINNERS_CHUNK anteriores se siguen leyendo
+    FINAL_RESPONSES = (Protocol.MSG_SUCCESS, Protocol.MSG_ERROR, Protocol.MSG_RETRY, Protocol.MSG_WINNERS_END)
+
+    def __init__(self, address: tuple, records, realtime: bool = False):
+        self._address = address
+        self._realtime = realtime
+        self._protocol = Protocol()
+        self._connections = {}
+        self._first_timestamp = None
+        for record in records:
+            if self._first_timestamp is None:
+                self._first_timestamp = record[0]
+            self._connections.setdefault(record[1], []).append(record)
+
+        self._lock = threading.Lock()
+        self._latencies = {}  # tipo -> latencias en segundos
+        self._bets = 0
+        self._bytes = 0
+        self._errors = 0
+
+    def run(self) -> dict:
+        started_at = time.monotonic()
+        threads = [threading.Thread(target=self._replay_connection, args=(records, started_at), daemon=True)
+                   for records in self._connections.values()]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return self._report(time.monotonic() - started_at)
+
+    def _replay_connection(self, records, started_at):
+        try:
+            if self._realtime:
+                self._sleep_until(started_at + records[0][0] - self._first_timestamp)
+            sock = self._connect()
+        except OSError as e:
+            logging.error(f'action: replay_connect | result: fail | error: {e}')
+            with self._lock:
+                self._errors += len(records)
+            return
+
+        with sock:
+            for timestamp, _, msg_type, payload in records:
+                if self._realtime:
+                    self._sleep_until(started_at + timestamp - self._first_timestamp)
+                sent_at = time.monotonic()
+                if not self._protocol.send_message(sock, msg_type, payload) or not self._await_response(sock):
+                    with self._lock:
+                        self._errors += 1
+                    return
+                self._record(msg_type, payload, time.monotonic() - sent_at)
+
+    def _connect(self) -> socket.socket:
+        if isinstance(self._address, str):
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                sock.connect(self._address)
+            except OSError:
+                sock.close()
+                raise
+            return sock
+        return socket.create_connection(self._address)
+
+    def _await_response(self, sock) -> bool:
+        while True:
+            result = self._protocol.receive_message(sock)
+            if not result:
+                return False
+            if result[0] in self.FINAL_RESPONSES:
+                return True
+
+    def _record(self, msg_type: int, payload: bytes, latency: float):
+        if msg_type == Protocol.MSG_BATCH:
+            bets = struct.unpack_from('!I', payload)[0]
+        else:
+            bets = 1 if msg_type == Protocol.MSG_BET else 0
+        with self._lock:
+            self._latencies.setdefault(msg_type, []).append(latency)
+            self._bets += bets
+            self._bytes += len(payload)
+
+    def _sleep_until(self, deadline: float):
+        remaining = deadline - time.monotonic()
+        if remaining > 0:
+            time.sleep(remaining)
+
+    def _report(self, duration: float) -> dict:
+        messages = sum(len(latencies) for latencies in self._latencies.values())
+        return {
+            'connections': len(self._connections),
+            'messages': messages,
+            'bets': self._bets,
+            'errors': self._errors,
+            'duration_s': duration,
+            'messages_per_s': messages / duration if duration else 0.0,
+            'bets_per_s': self._bets / duration if duration else 0.0,
+            'bytes_per_s': self._bytes / duration if duration else 0.0,
+            'latency_ms': {msg_type: _percentiles(latencies) for msg_type, latencies in sorted(self._latencies.items())},
+        }
+
+
+def _percentiles(latencies: list) -> dict:
+    ordered = sorted(latencies)
+
+    def at(fraction):
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] * 1000
+
+    return {'count': len(ordered), 'p50': at(0.50), 'p95': at(0.95), 'p99': at(0.99), 'max': ordered[-1] * 1000}
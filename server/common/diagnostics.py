@@ -0,0 +1,125 @@
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+import traceback
+import tracemalloc
+from collections import Counter
+
+
+class Diagnostics:
+    """
+    Hooks de diagnóstico que se activan con señales sobre el server en ejecución.
+
+    - SIGUSR1: vuelca los stacks de todos los threads e inicia una sesión de
+      profiling por muestreo de los threads de atención y de escritura durante
+      'profile_seconds'. El resultado se escribe en formato collapsed stacks
+      (una línea por stack con su cantidad de muestras, apto para flamegraph).
+    - SIGUSR2: alterna una sesión de tracemalloc. La primera señal inicia
+      tracemalloc y toma un snapshot; la siguiente escribe la diferencia
+      contra ese snapshot y detiene tracemalloc, y la próxima vuelve a empezar.
+
+    Mientras no hay sesión activa no se instala ningún hook en el intérprete.
+    Los resultados se guardan en 'output_dir' con un timestamp en el nombre.
+    """
+
+    SAMPLE_INTERVAL = 0.005  # 5ms entre muestras
+    TOP_STATS = 30
+    THREAD_PREFIXES = ("client_handler", "batch_scheduler")
+
+    def __init__(self, output_dir: str, profile_seconds: float):
+        self._output_dir = output_dir
+        self._profile_seconds = profile_seconds
+        self._profiling = threading.Event()
+        self._snapshot = None
+        self._snapshot_lock = threading.Lock()
+
+    def install(self, profile_signal, tracemalloc_signal):
+        signal.signal(profile_signal, lambda signum, frame: self._spawn(self.dump_and_profile))
+        signal.signal(tracemalloc_signal, lambda signum, frame: self._spawn(self.tracemalloc_step))
+
+    def _spawn(self, target):
+        # Los handlers de señales corren en el main thread: el trabajo se hace aparte
+        threading.Thread(target=target, name="diagnostics", daemon=True).start()
+
+    def dump_and_profile(self):
+        self.dump_stacks()
+        self.profile(self._profile_seconds)
+
+    def dump_stacks(self) -> str:
+        """Escribe el stack actual de cada thread"""
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        lines = []
+        for ident, frame in sys._current_frames().items():
+            lines.append(f'--- thread: {names.get(ident, ident)} ---\n')
+            lines.extend(traceback.format_stack(frame))
+        return self._write('stacks', ''.join(lines))
+
+    def profile(self, seconds: float) -> str:
+        """Muestrea los stacks de los threads client_handler y batch_scheduler durante 'seconds'"""
+        if self._profiling.is_set():
+            logging.info('action: profile | result: skipped | reason: already running')
+            return None
+
+        self._profiling.set()
+        logging.info(f'action: profile | result: in_progress | seconds: {seconds}')
+        samples = Counter()
+        total = 0
+        try:
+            deadline = time.monotonic() + seconds
+            while time.monotonic() < deadline:
+                handlers = {t.ident for t in threading.enumerate() if t.name.startswith(self.THREAD_PREFIXES)}
+                for ident, frame in sys._current_frames().items():
+                    if ident in handlers:
+                        samples[self._collapse(frame)] += 1
+                        total += 1
+                time.sleep(self.SAMPLE_INTERVAL)
+        finally:
+            self._profiling.clear()
+
+        content = ''.join(f'{stack} {count}\n' for stack, count in samples.most_common())
+        path = self._write('profile', content)
+        logging.info(f'action: profile | result: success | samples: {total} | file: {path}')
+        return path
+
+    def tracemalloc_step(self) -> str:
+        """Inicia una sesión de tracemalloc o la termina escribiendo la diferencia contra su inicio"""
+        with self._snapshot_lock:
+            if self._snapshot is None:
+                tracemalloc.start()
+                self._snapshot = tracemalloc.take_snapshot()
+                logging.info('action: tracemalloc | result: started')
+                return None
+
+            snapshot = tracemalloc.take_snapshot()
+            stats = snapshot.compare_to(self._snapshot, 'lineno')[:self.TOP_STATS]
+            current, peak = tracemalloc.get_traced_memory()
+            # Sin sesión activa no queda el costo de trazar cada alocación
+            tracemalloc.stop()
+            self._snapshot = None
+
+        content = f'current: {current} bytes | peak: {peak} bytes\n'
+        content += ''.join(f'{stat}\n' for stat in stats)
+        path = self._write('tracemalloc', content)
+        logging.info(f'action: tracemalloc | result: success | file: {path}')
+        return path
+
+    def _collapse(self, frame) -> str:
+        """Convierte un frame en 'func (archivo:linea);...' desde la raíz"""
+        entries = []
+        while frame is not None:
+            code = frame.f_code
+            entries.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})')
+            frame = frame.f_back
+        return ';'.join(reversed(entries))
+
+    def _write(self, kind: str, content: str) -> str:
+        os.makedirs(self._output_dir, exist_ok=True)
+        now = time.time()
+        timestamp = time.strftime('%Y%m%d-%H%M%S', time.localtime(now)) + f'.{int(now * 1000) % 1000:03d}'
+        path = os.path.join(self._output_dir, f'{kind}-{timestamp}.txt')
+        with open(path, 'w') as file:
+            file.write(content)
+        return path
@@ -0,0 +1,173 @@
+import socket
+import logging
+import signal
+import sys
+import threading
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from .protocol import Protocol
+from .utils import has_won
+
+
+class FollowerServer:
+    """
+    Réplica de solo lectura que responde MSG_WINNERS_QUERY.
+
+    Sigue el log de apuestas que publica el primario (ReplicationPublisher)
+    y mantiene en memoria el índice de ganadores por agencia y el conjunto
+    de agencias finalizadas, sin tocar el archivo de apuestas.
+    """
+
+    RECONNECT_DELAY = 1.0
+
+    def __init__(self, port, listen_backlog, primary_address):
+        # Initialize server socket
+        self._server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._server_socket.bind(('', port))
+        self._server_socket.listen(listen_backlog)
+
+        host, primary_port = primary_address.rsplit(':', 1)
+        self._primary_address = (host, int(primary_port))
+        self._primary_sock = None
+
+        self._shutdown_requested = False
+        self._protocol = Protocol()
+
+        # Thread pool for handling winners queries
+        self._max_workers = int(os.environ.get('MAX_WORKERS', 5))
+        self._thread_pool = ThreadPoolExecutor(max_workers=self._max_workers, thread_name_prefix="follower_handler")
+
+        # Estado replicado desde el primario
+        self._winners = {}
+        self._finished_agencies = set()
+        self._expected_agencies = int(os.environ.get('EXPECTED_AGENCIES', 3))
+        self._state_lock = threading.Lock()
+
+        self._replication_thread = threading.Thread(target=self._follow_primary, name="replication_follower", daemon=True)
+
+        signal.signal(signal.SIGTERM, self._signal_handler)
+        signal.signal(signal.SIGINT, self._signal_handler)
+
+    def _signal_handler(self, signum, frame):
+        logging.info(f'action: signal_received | result: success | signal: {signum}')
+        self._shutdown_requested = True
+        self._graceful_shutdown()
+
+    def _follow_primary(self):
+        """Consume el log del primario, reconectando si la conexión se pierde"""
+        while not self._shutdown_requested:
+            try:
+                self._primary_sock = socket.create_connection(self._primary_address)
+                logging.info(f'action: follow_primary | result: success | primary: {self._primary_address[0]}')
+
+                # El primario reenvía todo el log al reconectar: se reconstruye el índice
+                with self._state_lock:
+                    self._winners = {}
+                    self._finished_agencies = set()
+
+                while True:
+                    result = self._protocol.receive_message(self._primary_sock)
+                    if not result:
+                        break
+                    self._apply(*result)
+            except OSError as e:
+                if not self._shutdown_requested:
+                    logging.error(f'action: follow_primary | result: fail | error: {e}')
+            finally:
+                if self._primary_sock:
+                    self._primary_sock.close()
+
+            if not self._shutdown_requested:
+                time.sleep(self.RECONNECT_DELAY)
+
+    def _apply(self, msg_type: int, payload: bytes):
+        """Aplica un registro del log replicado al estado local"""
+        if msg_type == Protocol.MSG_BATCH:
+            bets = self._protocol.decode_batch(payload) or []
+            with self._state_lock:
+                for bet in bets:
+                    agency_winners = self._winners.setdefault(str(bet.agency), [])
+                    if has_won(bet):
+                        agency_winners.append(bet.document)
+        elif msg_type == Protocol.MSG_FINISHED:
+            agency_id, _ = self._protocol._decode_string(payload, 0)
+            with self._state_lock:
+                self._finished_agencies.add(agency_id)
+            logging.info(f'action: replicated_agency_finished | result: success | agency: {agency_id}')
+        else:
+            logging.error(f'action: apply_replicated | result: fail | type: {msg_type}')
+
+    def _graceful_shutdown(self):
+        logging.info('action: graceful_shutdown | result: in_progress')
+
+        if self._primary_sock:
+            try:
+                self._primary_sock.close()
+                logging.info('action: close_primary_connection | result: success')
+            except Exception as e:
+                logging.error(f'action: close_primary_connection | result: fail | error: {e}')
+
+        try:
+            self._thread_pool.shutdown(wait=False)
+            logging.info('action: shutdown_thread_pool | result: success')
+        except Exception as e:
+            logging.error(f'action: shutdown_thread_pool | result: fail | error: {e}')
+
+        try:
+            self._server_socket.close()
+            logging.info('action: close_server_socket | result: success')
+        except Exception as e:
+            logging.error(f'action: close_server_socket | result: fail | error: {e}')
+
+        logging.info('action: graceful_shutdown | result: success')
+        sys.exit(0)
+
+    def run(self):
+        """Loop de aceptación de consultas de ganadores"""
+        logging.info(f'action: follower_start | result: success | max_workers: {self._max_workers}')
+        self._replication_thread.start()
+
+        self._server_socket.settimeout(1.0)
+        while not self._shutdown_requested:
+            try:
+                client_sock, addr = self._server_socket.accept()
+                client_sock.settimeout(None)
+                logging.info(f'action: accept_connections | result: success | ip: {addr[0]}')
+                self._thread_pool.submit(self._handle_client_connection, client_sock)
+            except socket.timeout:
+                continue
+            except Exception as e:
+                if not self._shutdown_requested:
+                    logging.error(f'action: accept_connection | result: fail | error: {e}')
+                break
+
+        self._graceful_shutdown()
+
+    def _handle_client_connection(self, client_sock):
+        try:
+            while True:
+                result = self._protocol.receive_message(client_sock)
+                if not result:
+                    break
+
+                msg_type, payload = result
+                if msg_type != Protocol.MSG_WINNERS_QUERY:
+                    logging.error(f'action: unknown_message | result: fail | type: {msg_type}')
+                    break
+
+                agency_id, _ = self._protocol._decode_string(payload, 0)
+                with self._state_lock:
+                    finished = len(self._finished_agencies)
+                    winners = list(self._winners.get(agency_id, []))
+
+                if finished >= self._expected_agencies:
+                    if not self._protocol.send_winners_response(client_sock, winners):
+                        break
+                else:
+                    self._protocol.send_retry_response(client_sock, f"Lottery not completed yet. {finished}/{self._expected_agencies} agencies finished.")
+        except Exception as e:
+            logging.error(f'action: winners_query | result: fail | error: {e}')
+        finally:
+            client_sock.close()
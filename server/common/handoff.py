@@ -0,0 +1,93 @@
+import json
+import logging
+import os
+import socket
+import threading
+from typing import List, Optional, Tuple
+
+HANDOFF_REQUEST = b'H'
+MAX_STATE_SIZE = 65536
+MAX_LISTENERS = 2  # TCP y, opcionalmente, el listener Unix
+
+
+def request_handoff(path: str) -> Optional[Tuple[List[socket.socket], dict]]:
+    """
+    Pide al proceso anterior sus sockets de escucha y su estado.
+    Retorna ([sockets], estado) o None si no hay proceso anterior escuchando.
+    """
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(path)
+            sock.sendall(HANDOFF_REQUEST)
+            # El proceso anterior responde recién cuando drenó sus conexiones
+            data, fds, _, _ = socket.recv_fds(sock, MAX_STATE_SIZE, MAX_LISTENERS)
+    except (FileNotFoundError, ConnectionRefusedError):
+        return None
+
+    if not fds:
+        raise RuntimeError("handoff response without listening socket")
+
+    listen_sockets = [socket.socket(fileno=fd) for fd in fds]
+    state = json.loads(data.decode('utf-8'))
+    logging.info(f'action: handoff_received | result: success | listeners: {len(listen_sockets)} | state: {state}')
+    return listen_sockets, state
+
+
+class HandoffListener:
+    """
+    Espera en un socket Unix a que un proceso nuevo pida el handoff.
+
+    'prepare' drena el server y retorna ([sockets_de_escucha], estado);
+    los fds viajan con SCM_RIGHTS, en el mismo orden, junto al estado en JSON.
+    Luego se llama a 'on_complete' para que el proceso termine, o a
+    'on_abort' si el envío falló y el server debe volver a aceptar.
+    """
+
+    def __init__(self, path: str, prepare, on_complete, on_abort):
+        self._path = path
+        self._prepare = prepare
+        self._on_complete = on_complete
+        self._on_abort = on_abort
+
+        # Un socket viejo en el path ya fue consumido por este proceso al pedir el handoff
+        if os.path.exists(path):
+            os.unlink(path)
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._socket.bind(path)
+        self._socket.listen(1)
+        self._thread = threading.Thread(target=self._run, name="handoff_listener", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        logging.info(f'action: handoff_listen | result: success | path: {self._path}')
+
+    def close(self):
+        try:
+            self._socket.close()
+        except OSError:
+            pass
+
+    def _run(self):
+        while True:
+            try:
+                conn, _ = self._socket.accept()
+            except OSError:
+                return
+
+            with conn:
+                try:
+                    if conn.recv(1) != HANDOFF_REQUEST:
+                        continue
+                    logging.info('action: handoff_requested | result: in_progress')
+                    listen_sockets, state = self._prepare()
+                    payload = json.dumps(state).encode('utf-8')
+                    socket.send_fds(conn, [payload], [sock.fileno() for sock in listen_sockets])
+                    logging.info(f'action: handoff_sent | result: success | state: {state}')
+                except Exception as e:
+                    logging.error(f'action: handoff_sent | result: fail | error: {e}')
+                    self._on_abort()
+                    continue
+
+            self.close()
+            self._on_complete()
+            return
@@ -0,0 +1,192 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class LatencyWindow:
+    """Acumula mediciones de tiempo y las entrega promediadas por ventana"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._count = 0
+        self._total = 0.0
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._count += 1
+            self._total += seconds
+
+    def take(self) -> float:
+        """Retorna el promedio de la ventana (segundos) y la reinicia"""
+        with self._lock:
+            avg = self._total / self._count if self._count else 0.0
+            self._count = 0
+            self._total = 0.0
+            return avg
+
+
+class ElasticPool:
+    """
+    Pool de threads que ajusta su tamaño entre 'min_workers' y 'max_workers'.
+
+    submit crea un worker en el momento si no hay ninguno libre, así una
+    conexión nueva no espera al thread de control. Ese thread, cada
+    ADJUST_INTERVAL segundos, mira la espera en cola de las conexiones, la
+    latencia de ack de los batches y la espera para almacenar
+    ('contention_fn'). Si la espera para almacenar domina la latencia de ack
+    retiene el crecimiento (más handlers solo alargan la cola) hasta que
+    alguna conexión espere MAX_HOLD, y ahí o al terminar la retención crea
+    workers para las que siguen en cola; se achica si sobran workers ociosos.
+    Expone submit/shutdown como ThreadPoolExecutor.
+    """
+
+    ADJUST_INTERVAL = 1.0
+    QUEUE_WAIT_TARGET = 0.05   # 50ms de espera por un worker
+    CONTENTION_LIMIT = 0.2     # 200ms esperando para almacenar
+    MAX_HOLD = 2.0             # ninguna conexión espera un worker más que esto
+
+    def __init__(self, min_workers: int, max_workers: int, thread_name_prefix: str, contention_fn=None):
+        self._min_workers = max(1, min_workers)
+        self._max_workers = max(self._min_workers, max_workers)
+        self._prefix = thread_name_prefix
+        self._contention_fn = contention_fn or (lambda: 0.0)
+
+        self._tasks = queue.Queue()
+        self._lock = threading.Lock()
+        self._workers = set()
+        self._busy = 0
+        self._retire = 0
+        self._next_id = 0
+        self._stopped = False
+        self._holding = False  # el almacenamiento es el cuello de botella: submit no crece
+
+        self._queue_wait = LatencyWindow()
+        self._ack_latency = LatencyWindow()
+
+        for _ in range(self._min_workers):
+            self._spawn_worker()
+        self._controller = threading.Thread(target=self._control_loop, name="pool_controller", daemon=True)
+        self._controller.start()
+
+    @property
+    def size(self) -> int:
+        with self._lock:
+            return len(self._workers) - self._retire
+
+    def submit(self, fn, *args) -> Future:
+        future = Future()
+        with self._lock:
+            if self._stopped:
+                raise RuntimeError("cannot submit after shutdown")
+            self._tasks.put((future, fn, args, time.monotonic()))
+            size = len(self._workers) - self._retire
+            if not self._holding and self._busy + self._tasks.qsize() > size:
+                # Sin workers libres: se cancela un retiro pendiente o se crea uno nuevo
+                if self._retire > 0:
+                    self._retire -= 1
+                elif size < self._max_workers:
+                    self._spawn_worker()
+        return future
+
+    def record_ack_latency(self, seconds: float):
+        """Tiempo entre recibir un batch y enviar su ack"""
+        self._ack_latency.record(seconds)
+
+    def shutdown(self, wait: bool = True, timeout: float = None):
+        with self._lock:
+            self._stopped = True
+            workers = list(self._workers)
+        for _ in workers:
+            self._tasks.put(None)
+        if wait:
+            deadline = None if timeout is None else time.monotonic() + timeout
+            for worker in workers:
+                remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+                worker.join(remaining)
+
+    def _spawn_worker(self):
+        """Debe llamarse con el lock tomado o antes de iniciar el controlador"""
+        worker = threading.Thread(target=self._worker_loop, name=f"{self._prefix}_{self._next_id}", daemon=True)
+        self._next_id += 1
+        self._workers.add(worker)
+        worker.start()
+
+    def _worker_loop(self):
+        me = threading.current_thread()
+        while True:
+            try:
+                task = self._tasks.get(timeout=self.ADJUST_INTERVAL)
+            except queue.Empty:
+                task = False
+
+            with self._lock:
+                if task is None or (task is False and (self._retire > 0 or self._stopped)):
+                    if task is False and self._retire > 0:
+                        self._retire -= 1
+                    self._workers.discard(me)
+                    return
+                if task is False:
+                    continue
+                self._busy += 1
+
+            future, fn, args, submitted_at = task
+            self._queue_wait.record(time.monotonic() - submitted_at)
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(fn(*args))
+                except BaseException as e:
+                    future.set_exception(e)
+
+            with self._lock:
+                self._busy -= 1
+
+    def _oldest_wait(self) -> float:
+        """Tiempo que lleva esperando la conexión más antigua en cola"""
+        with self._tasks.mutex:
+            for task in self._tasks.queue:
+                if task:
+                    return time.monotonic() - task[3]
+        return 0.0
+
+    def _control_loop(self):
+        while True:
+            time.sleep(self.ADJUST_INTERVAL)
+            with self._lock:
+                if self._stopped:
+                    return
+            self._adjust()
+
+    def _adjust(self):
+        queue_wait = self._queue_wait.take()
+        ack_latency = self._ack_latency.take()
+        contention = self._contention_fn()
+        queued = self._tasks.qsize()
+        oldest_wait = self._oldest_wait()
+
+        with self._lock:
+            size = len(self._workers) - self._retire
+            idle = size - self._busy
+            decision = None
+
+            storage_bound = contention > self.CONTENTION_LIMIT and contention >= ack_latency / 2
+            self._holding = storage_bound
+            # submit ya crece por cada conexión nueva: acá solo crecen las que quedaron esperando
+            if queued > 0 and oldest_wait > self.QUEUE_WAIT_TARGET and size < self._max_workers:
+                if storage_bound and oldest_wait < self.MAX_HOLD:
+                    decision = 'hold'
+                else:
+                    decision = 'grow'
+                    for _ in range(min(max(queued, 1), self._max_workers - size)):
+                        self._spawn_worker()
+            elif queued == 0 and idle > 1 and size > self._min_workers:
+                decision = 'shrink'
+                self._retire += 1
+
+            new_size = len(self._workers) - self._retire
+
+        if decision:
+            logging.info(f'action: pool_scale | result: success | decision: {decision} | workers: {size}->{new_size} | '
+                         f'queued: {queued} | queue_wait_ms: {queue_wait * 1000:.1f} | '
+                         f'ack_latency_ms: {ack_latency * 1000:.1f} | store_wait_ms: {contention * 1000:.1f}')
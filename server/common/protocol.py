@@ -1,6 +1,7 @@
 import logging
 import socket
 import struct
+import threading
 from typing import Optional, Tuple, List
 from .utils import Bet, store_bets
 
@@ -17,13 +18,31 @@ class Protocol:
     MSG_WINNERS_QUERY = 0x06
     MSG_WINNERS_RESPONSE = 0x07
     MSG_RETRY = 0x08 # Nuevo tipo de mensaje para retry
+    MSG_WINNERS_CHUNK = 0x09 # Parte de la lista de ganadores
+    MSG_WINNERS_END = 0x0A # Fin de la lista de ganadores (con el total)
 
-    def __init__(self, storage_lock=None):
+    def __init__(self, storage_lock=None, scheduler=None, buffer_pool=None, recorder=None):
         self._storage_lock = storage_lock
+        self._scheduler = scheduler
+        # Pool de buffers de recepción con presupuesto global (opcional)
+        self._buffer_pool = buffer_pool
+        # Captura de los mensajes recibidos para reproducirlos después (opcional)
+        self._recorder = recorder
+        # Buffer de header reutilizado por cada thread que recibe (el Protocol es compartido)
+        self._local = threading.local()
+        
+        # Frames pre-serializados para los acks fijos (no cambian entre mensajes)
+        self._finished_ack_frames = {
+            True: self.build_frame(self.MSG_SUCCESS, self._encode_string("OK")),
+            False: self.build_frame(self.MSG_ERROR, self._encode_string("ERROR")),
+        }
     
     def _store_bets_thread_safe(self, bets: list[Bet]) -> None:
         """Thread-safe version of store_bets using the provided lock"""
-        if self._storage_lock:
+        if self._scheduler:
+            # El scheduler intercala los batches por agencia y los almacena con el lock
+            self._scheduler.submit(str(bets[0].agency), bets)
+        elif self._storage_lock:
             with self._storage_lock:
                 store_bets(bets)
         else:
@@ -40,14 +59,45 @@ class Protocol:
             data += chunk
         return data
     
+    def _read_into(self, sock: socket.socket, view: memoryview) -> bool:
+        """Llena 'view' con datos del socket sin alocar buffers intermedios"""
+        while view:
+            received = sock.recv_into(view)
+            if not received:
+                return False
+            view = view[received:]
+        return True
+    
     def _write_exact(self, sock: socket.socket, data: bytes) -> bool:
         """Escribe exactamente todos los datos al socket"""
-        total_sent = 0
-        while total_sent < len(data):
-            sent = sock.send(data[total_sent:])
+        # memoryview permite avanzar sobre envíos parciales sin copiar
+        view = memoryview(data)
+        while view:
+            sent = sock.send(view)
+            if sent == 0:
+                return False
+            view = view[sent:]
+        return True
+    
+    def _write_vectored(self, sock: socket.socket, buffers) -> bool:
+        """Escribe todos los buffers al socket usando scatter/gather (sendmsg)"""
+        if not hasattr(sock, 'sendmsg'):
+            # Plataformas sin sendmsg: una sola copia y envío normal
+            return self._write_exact(sock, b"".join(buffers))
+        
+        views = [memoryview(buf) for buf in buffers if len(buf)]
+        while views:
+            sent = sock.sendmsg(views)
             if sent == 0:
                 return False
-            total_sent += sent
+            # Descartar los buffers enviados por completo y recortar el parcial
+            while sent:
+                if sent >= len(views[0]):
+                    sent -= len(views[0])
+                    views.pop(0)
+                else:
+                    views[0] = views[0][sent:]
+                    sent = 0
         return True
     
     def _encode_string(self, s: str) -> bytes:
@@ -66,18 +116,22 @@ class Protocol:
         if offset + length > len(data):
             raise ValueError("Datos insuficientes para decodificar string")
         
+        # str() acepta tanto bytes como memoryview (payloads del pool de buffers)
         string_data = data[offset:offset+length]
-        return string_data.decode('utf-8'), offset + length
+        return str(string_data, 'utf-8'), offset + length
     
     def receive_message(self, client_sock: socket.socket) -> Optional[Tuple[int, bytes]]:
         """
         Recibe un mensaje completo del cliente
         Retorna: (tipo_mensaje, payload) o None si hay error
+        
+        Con un pool de buffers el payload es un memoryview sobre un buffer
+        prestado: hay que devolverlo con release_payload al terminar de usarlo.
         """
         try:
-            # Leer header (longitud + tipo)
-            header = self._read_exact(client_sock, self.HEADER_SIZE)
-            if not header:
+            # Leer header (longitud + tipo) sin alocar bytes nuevos por mensaje
+            header = self._header_buffer()
+            if not self._read_into(client_sock, memoryview(header)):
                 return None
             
             # Parsear header
@@ -88,6 +142,12 @@ class Protocol:
                 logging.error(f"action: receive_message | result: fail | error: message too large ({payload_length} bytes)")
                 return None
             
+            if self._buffer_pool:
+                payload = self._receive_pooled_payload(client_sock, payload_length)
+                if self._recorder:
+                    self._recorder.record(client_sock, msg_type, payload)
+                return msg_type, payload
+            
             # Leer payload
             payload = self._read_exact(client_sock, payload_length)
             if not payload:
@@ -100,28 +160,78 @@ class Protocol:
                 logging.error("action: receive_message | result: fail | error: invalid delimiter")
                 return None
             
+            if self._recorder:
+                self._recorder.record(client_sock, msg_type, payload)
             return msg_type, payload
             
         except Exception as e:
             logging.error(f"action: receive_message | result: fail | error: {e}")
             return None
     
+    def _header_buffer(self) -> bytearray:
+        header = getattr(self._local, 'header', None)
+        if header is None:
+            header = self._local.header = bytearray(self.HEADER_SIZE)
+        return header
+    
+    def _receive_pooled_payload(self, client_sock: socket.socket, payload_length: int) -> memoryview:
+        """
+        Lee payload y delimitador en un buffer del pool (bloquea si el presupuesto
+        de memoria está agotado). Lanza ValueError si el mensaje está incompleto.
+        """
+        buffer = self._buffer_pool.acquire()
+        try:
+            view = memoryview(buffer)[:payload_length + 1]
+            # Payload vacío: mismo criterio que la lectura sin pool
+            if not payload_length or not self._read_into(client_sock, view):
+                raise ValueError("incomplete payload")
+            if view[payload_length] != self.DELIMITER[0]:
+                raise ValueError("invalid delimiter")
+            return view[:payload_length]
+        except BaseException:
+            self._buffer_pool.release(buffer)
+            raise
+    
+    def release_payload(self, payload) -> None:
+        """Devuelve al pool el buffer de un payload recibido con receive_message"""
+        if self._buffer_pool and isinstance(payload, memoryview):
+            buffer = payload.obj
+            payload.release()
+            self._buffer_pool.release(buffer)
+    
     def send_message(self, client_sock: socket.socket, msg_type: int, payload: bytes) -> bool:
         """
         Envía un mensaje completo al cliente
         """
         try:
-            # Construir mensaje completo
+            # Header, payload y delimitador se envían juntos sin concatenarlos
             header = struct.pack('!IB', len(payload), msg_type)
-            message = header + payload + self.DELIMITER
-            
-            # Enviar mensaje completo
-            return self._write_exact(client_sock, message)
+            return self._write_vectored(client_sock, (header, payload, self.DELIMITER))
             
         except Exception as e:
             logging.error(f"action: send_message | result: fail | error: {e}")
             return False
     
+    def build_frame(self, msg_type: int, payload: bytes) -> bytes:
+        """
+        Serializa un mensaje completo (header + payload + delimitador)
+        """
+        frame = bytearray(self.HEADER_SIZE + len(payload) + 1)
+        struct.pack_into('!IB', frame, 0, len(payload), msg_type)
+        frame[self.HEADER_SIZE:-1] = payload
+        frame[-1:] = self.DELIMITER
+        return bytes(frame)
+    
+    def send_frame(self, client_sock: socket.socket, frame: bytes) -> bool:
+        """
+        Envía un mensaje ya serializado con build_frame
+        """
+        try:
+            return self._write_exact(client_sock, frame)
+        except Exception as e:
+            logging.error(f"action: send_frame | result: fail | error: {e}")
+            return False
+    
     def decode_bet(self, payload: bytes) -> Optional[Bet]:
         """
         Decodifica una apuesta desde el payload
@@ -168,13 +278,17 @@ class Protocol:
         payload += self._encode_string(str(bet.number))
         return payload
     
-    def encode_response(self, dni: str, numero: str) -> bytes:
+    def encode_response(self, dni: str, numero: str, recommended_batch: int = 0) -> bytes:
         """
-        Codifica una respuesta a bytes
+        Codifica una respuesta a bytes.
+        Si 'recommended_batch' es positivo se agrega al final (uint16) el tamaño
+        de batch que recomienda el server; los clientes que no lo usan lo ignoran.
         """
         payload = b""
         payload += self._encode_string(dni)
         payload += self._encode_string(numero)
+        if recommended_batch > 0:
+            payload += struct.pack('!H', min(recommended_batch, 0xFFFF))
         return payload
     
     def receive_bet(self, client_sock: socket.socket) -> Optional[Bet]:
@@ -193,12 +307,12 @@ class Protocol:
         
         return self.decode_bet(payload)
     
-    def send_response(self, client_sock: socket.socket, success: bool, dni: str, numero: str) -> bool:
+    def send_response(self, client_sock: socket.socket, success: bool, dni: str, numero: str, recommended_batch: int = 0) -> bool:
         """
         Envía respuesta al cliente
         """
         msg_type = self.MSG_SUCCESS if success else self.MSG_ERROR
-        payload = self.encode_response(dni, numero)
+        payload = self.encode_response(dni, numero, recommended_batch)
         return self.send_message(client_sock, msg_type, payload)
     
     def decode_batch(self, payload: bytes) -> Optional[List[Bet]]:
@@ -242,6 +356,35 @@ class Protocol:
             logging.error(f"action: decode_batch | result: fail | error: {e}")
             return None
     
+    def encode_batches(self, bets: list[Bet]):
+        """
+        Codifica apuestas en uno o más payloads de batch que respetan MAX_MESSAGE_SIZE
+        """
+        encoded = []
+        size = 4
+        for bet in bets:
+            bet_data = self.encode_bet(bet)
+            if encoded and size + 4 + len(bet_data) > self.MAX_MESSAGE_SIZE:
+                yield self._join_batch(encoded, size)
+                encoded = []
+                size = 4
+            encoded.append(bet_data)
+            size += 4 + len(bet_data)
+        if encoded:
+            yield self._join_batch(encoded, size)
+    
+    def _join_batch(self, encoded: list[bytes], size: int) -> bytearray:
+        """Arma el payload de un batch a partir de apuestas ya codificadas"""
+        payload = bytearray(size)
+        struct.pack_into('!I', payload, 0, len(encoded))
+        offset = 4
+        for bet_data in encoded:
+            struct.pack_into('!I', payload, offset, len(bet_data))
+            offset += 4
+            payload[offset:offset + len(bet_data)] = bet_data
+            offset += len(bet_data)
+        return payload
+    
     def receive_batch(self, client_sock: socket.socket) -> Optional[List[Bet]]:
         """
         Recibe un batch de apuestas del cliente
@@ -341,9 +484,10 @@ class Protocol:
             self.send_response(client_sock, False, bet.document, str(bet.number))
             return False
     
-    def _process_batch_from_payload(self, client_sock: socket.socket, payload: bytes) -> bool:
+    def _process_batch_from_payload(self, client_sock: socket.socket, payload: bytes, recommended_batch: int = 0) -> bool:
         """
-        Procesa un batch de apuestas desde el payload ya recibido
+        Procesa un batch de apuestas desde el payload ya recibido.
+        El ack incluye 'recommended_batch' si es positivo.
         """
         bets = self.decode_batch(payload)
         if not bets:
@@ -370,7 +514,7 @@ class Protocol:
             
             # Enviar respuesta de confirmación (usamos la primera apuesta como referencia)
             first_bet = bets[0]
-            return self.send_response(client_sock, success, first_bet.document, str(first_bet.number))
+            return self.send_response(client_sock, success, first_bet.document, str(first_bet.number), recommended_batch)
             
         except Exception as e:
             logging.error(f"action: process_batch | result: fail | error: {e}")
@@ -402,13 +546,27 @@ class Protocol:
             logging.error(f"action: receive_finished | result: fail | error: {e}")
             return None
     
+    def decode_finished(self, payload: bytes) -> Tuple[str, int, int]:
+        """
+        Decodifica una notificación de finalización: (agencia, índice de stream, cantidad de streams).
+        Las notificaciones sin información de stream corresponden a una única conexión.
+        """
+        agency_id, offset = self._decode_string(payload, 0)
+        if offset == len(payload):
+            return agency_id, 0, 1
+        
+        if offset + 4 > len(payload):
+            raise ValueError("Datos insuficientes para decodificar stream")
+        stream_index, stream_count = struct.unpack('!HH', payload[offset:offset+4])
+        if stream_count == 0 or stream_index >= stream_count:
+            raise ValueError(f"Stream inválido {stream_index}/{stream_count}")
+        return agency_id, stream_index, stream_count
+    
     def send_finished_ack(self, client_sock: socket.socket, success: bool) -> bool:
         """
         Envía confirmación de recepción de notificación de finalización
         """
-        msg_type = self.MSG_SUCCESS if success else self.MSG_ERROR
-        payload = self._encode_string("OK" if success else "ERROR")
-        return self.send_message(client_sock, msg_type, payload)
+        return self.send_frame(client_sock, self._finished_ack_frames[success])
     
     def receive_winners_query(self, client_sock: socket.socket) -> Optional[str]:
         """
@@ -432,20 +590,46 @@ class Protocol:
             logging.error(f"action: receive_winners_query | result: fail | error: {e}")
             return None
     
-    def send_winners_response(self, client_sock: socket.socket, winners: list[str]) -> bool:
+    def send_winners_response(self, client_sock: socket.socket, winners) -> bool:
         """
-        Envía respuesta con la lista de ganadores
+        Envía los ganadores como una secuencia de MSG_WINNERS_CHUNK acotados por
+        MAX_MESSAGE_SIZE, terminada por MSG_WINNERS_END con el total enviado.
+        'winners' puede ser cualquier iterable: se consume a medida que se envía.
         """
-        payload = b""
+        chunk = []
+        size = 4
+        total = 0
+        for winner in winners:
+            dni = winner.encode('utf-8')
+            if chunk and size + 2 + len(dni) > self.MAX_MESSAGE_SIZE:
+                if not self.send_message(client_sock, self.MSG_WINNERS_CHUNK, self._join_winners(chunk, size)):
+                    return False
+                chunk = []
+                size = 4
+            chunk.append(dni)
+            size += 2 + len(dni)
+            total += 1
+        
+        if chunk and not self.send_message(client_sock, self.MSG_WINNERS_CHUNK, self._join_winners(chunk, size)):
+            return False
+        return self.send_message(client_sock, self.MSG_WINNERS_END, struct.pack('!I', total))
+    
+    def _join_winners(self, encoded: list[bytes], size: int) -> bytearray:
+        """Arma el payload de ganadores a partir de DNIs ya codificados"""
+        payload = bytearray(size)
         
         # Escribir cantidad de ganadores (4 bytes)
-        payload += struct.pack('!I', len(winners))
+        struct.pack_into('!I', payload, 0, len(encoded))
+        offset = 4
         
-        # Escribir cada DNI ganador
-        for winner in winners:
-            payload += self._encode_string(winner)
+        # Escribir cada DNI ganador con su longitud
+        for dni in encoded:
+            struct.pack_into('!H', payload, offset, len(dni))
+            offset += 2
+            payload[offset:offset + len(dni)] = dni
+            offset += len(dni)
         
-        return self.send_message(client_sock, self.MSG_WINNERS_RESPONSE, payload)
+        return payload
     
     def send_retry_response(self, client_sock: socket.socket, message: str = "Lottery not completed yet") -> bool:
         """
@@ -0,0 +1,191 @@
+import logging
+import queue
+import socket
+import threading
+from .protocol import Protocol
+
+
+def _batch_frames(protocol: Protocol, bets: list) -> list:
+    return [protocol.build_frame(Protocol.MSG_BATCH, payload) for payload in protocol.encode_batches(bets)]
+
+
+class _FollowerStream:
+    """
+    Conexión con un follower: envía primero el snapshot desde su propio
+    thread y después los registros en vivo de una cola acotada. Cada
+    registro es la lista de apuestas de un store, que se codifica en este
+    thread (fuera del lock de persistencia), o un frame ya armado. Si la
+    cola se llena el follower quedó atrasado y se lo desconecta; al
+    reconectarse recibe un snapshot nuevo.
+    """
+
+    def __init__(self, sock: socket.socket, protocol: Protocol, on_close, snapshot, max_pending: int):
+        self._sock = sock
+        self._protocol = protocol
+        self._on_close = on_close
+        self._snapshot = snapshot
+        self._records = queue.Queue(maxsize=max_pending)
+        self._thread = threading.Thread(target=self._run, name="replication_stream", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def offer(self, record) -> bool:
+        """Encola un registro en vivo sin bloquear; False si el follower está atrasado"""
+        try:
+            self._records.put_nowait(record)
+        except queue.Full:
+            return False
+        return True
+
+    def close(self):
+        """Termina después de enviar lo encolado, o de inmediato si la cola está llena"""
+        if not self.offer(None):
+            self.drop()
+
+    def drop(self):
+        """Corta la conexión sin esperar a que se envíe lo pendiente"""
+        try:
+            self._sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    def _run(self):
+        try:
+            for frame in self._snapshot:
+                if not self._protocol.send_frame(self._sock, frame):
+                    return
+            while True:
+                record = self._records.get()
+                if record is None:
+                    break
+                frames = [record] if isinstance(record, bytes) else _batch_frames(self._protocol, record)
+                if not all(self._protocol.send_frame(self._sock, frame) for frame in frames):
+                    break
+        finally:
+            # Cierra los archivos del snapshot si la conexión se cortó antes de terminarlo
+            self._snapshot.close()
+            self._sock.close()
+            self._on_close(self)
+            logging.info('action: follower_disconnected | result: success')
+
+
+class ReplicationPublisher:
+    """
+    Publica el log de apuestas del primario a los followers conectados.
+
+    Al conectarse, un follower recibe primero todas las apuestas guardadas
+    y las agencias ya finalizadas, y a partir de ahí cada store y cada
+    MSG_FINISHED en el mismo orden en que se aplicaron. El snapshot solo se
+    fija con el lock de persistencia tomado; se lee y se envía fuera de él.
+    Un follower con más de 'max_pending' stores en vivo sin enviar se
+    desconecta para no acumular memoria: al reconectarse arranca de nuevo.
+    """
+
+    SNAPSHOT_CHUNK = 1000  # apuestas leídas del archivo por cada codificación
+    MAX_PENDING = 4096     # stores en vivo encolados por follower antes de desconectarlo
+
+    def __init__(self, port: int, listen_backlog: int, storage_lock: threading.Lock, protocol: Protocol,
+                 snapshot_fn, finished=(), max_pending: int = MAX_PENDING):
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._socket.bind(('', port))
+        self._socket.listen(listen_backlog)
+        self._socket.settimeout(1.0)
+        self._port = port
+
+        self._storage_lock = storage_lock
+        self._protocol = protocol
+        # Fija las apuestas guardadas (con el lock de persistencia tomado) para leerlas después sin él
+        self._snapshot_fn = snapshot_fn
+        self._max_pending = max_pending
+        self._lock = threading.Lock()
+        self._followers = []
+        # Agencias ya finalizadas (heredadas en un handoff) que van al final de cada snapshot
+        self._finished = list(finished)
+        self._stopped = False
+        self._thread = threading.Thread(target=self._accept_loop, name="replication_publisher", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        logging.info(f'action: replication_start | result: success | port: {self._port}')
+
+    @property
+    def stopped(self) -> bool:
+        return self._stopped
+
+    def stop(self):
+        self._stopped = True
+        self._socket.close()
+        # Hasta que el accept en curso vence el puerto sigue tomado
+        if self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._thread.join(timeout=2.0)
+        with self._lock:
+            for stream in self._followers:
+                stream.close()
+
+    def publish_bets(self, bets: list) -> None:
+        """Publica apuestas recién almacenadas. Debe llamarse con el lock de persistencia tomado"""
+        # Los followers se registran con el lock de persistencia: ninguno aparece durante este store.
+        # Solo se encola la lista: cada follower la codifica en su thread, fuera del lock
+        if not self._followers:
+            return
+        with self._lock:
+            self._offer_locked(bets)
+
+    def publish_finished(self, agency_id: str) -> None:
+        with self._lock:
+            self._finished.append(agency_id)
+            if self._followers:
+                self._offer_locked(self._finished_frame(agency_id))
+
+    def _offer_locked(self, record):
+        for stream in [stream for stream in self._followers if not stream.offer(record)]:
+            self._followers.remove(stream)
+            stream.drop()
+            logging.error(f'action: follower_lagging | result: fail | pending: {self._max_pending} | disconnected: true')
+
+    def _accept_loop(self):
+        while not self._stopped:
+            try:
+                sock, addr = self._socket.accept()
+                sock.settimeout(None)
+                logging.info(f'action: follower_connected | result: success | ip: {addr[0]}')
+                self._add_follower(sock)
+            except socket.timeout:
+                continue
+            except Exception as e:
+                if not self._stopped:
+                    logging.error(f'action: follower_connected | result: fail | error: {e}')
+                break
+
+    def _add_follower(self, sock: socket.socket):
+        # Con el lock de persistencia tomado solo se fija el snapshot: se lee y codifica fuera de él
+        with self._storage_lock:
+            bets = self._snapshot_fn()
+            with self._lock:
+                snapshot = self._snapshot_frames(bets, list(self._finished))
+                stream = _FollowerStream(sock, self._protocol, self._remove_follower, snapshot, self._max_pending)
+                self._followers.append(stream)
+        stream.start()
+
+    def _remove_follower(self, stream: _FollowerStream):
+        with self._lock:
+            if stream in self._followers:
+                self._followers.remove(stream)
+
+    def _snapshot_frames(self, bets, finished: list):
+        """Frames del snapshot, codificados de a SNAPSHOT_CHUNK apuestas a medida que se envían"""
+        chunk = []
+        for bet in bets:
+            chunk.append(bet)
+            if len(chunk) >= self.SNAPSHOT_CHUNK:
+                yield from _batch_frames(self._protocol, chunk)
+                chunk = []
+        yield from _batch_frames(self._protocol, chunk)
+
+        for agency_id in finished:
+            yield self._finished_frame(agency_id)
+
+    def _finished_frame(self, agency_id: str) -> bytes:
+        return self._protocol.build_frame(Protocol.MSG_FINISHED, self._protocol._encode_string(agency_id))
@@ -0,0 +1,192 @@
+import logging
+import threading
+import time
+from collections import deque
+from .pool import LatencyWindow
+
+
+class _PendingBatch:
+    """Batch decodificado esperando ser almacenado"""
+
+    def __init__(self, bets):
+        self.bets = bets
+        self.enqueued_at = time.monotonic()
+        self.done = threading.Event()
+        self.error = None
+
+
+def _new_stats() -> dict:
+    return {'batches': 0, 'bets': 0, 'rounds': 0, 'max_depth': 0, 'waits': []}
+
+
+class BatchScheduler:
+    """
+    Intercala los batches de las agencias activas antes de almacenarlos.
+
+    Cada agencia tiene su propia cola y un único thread de escritura las
+    recorre con deficit round robin: en cada ronda una agencia suma
+    'quantum * peso' apuestas de crédito y almacena batches mientras le
+    alcance. Así una agencia chica no espera detrás de la carga completa
+    de una grande, y todo lo seleccionado en una ronda se escribe junto.
+
+    submit bloquea hasta que el batch se almacena y los clientes esperan el
+    ack antes de mandar el siguiente, así que cada cola tiene a lo sumo un
+    batch por stream de la agencia: la profundidad máxima de una agencia
+    con un solo stream es siempre 1 y no dice nada del intercalado. Lo que
+    sí lo refleja es la espera de cada batch hasta almacenarse (percentiles
+    por agencia) y cuántas apuestas se le almacenan por ronda.
+    """
+
+    DEFAULT_QUANTUM = 10  # apuestas por ronda con peso 1
+
+    def __init__(self, store_fn, quantum: int = DEFAULT_QUANTUM, weights: dict = None):
+        self._store_fn = store_fn
+        self._quantum = quantum
+        self._weights = weights or {}
+
+        self._queues = {}
+        self._deficits = {}
+        self._active = deque()
+        self._stats = {}
+        self._wait_window = LatencyWindow()
+        self._wait_windows = [self._wait_window]
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name="batch_scheduler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        logging.info(f'action: scheduler_start | result: success | quantum: {self._quantum}')
+
+    def stop(self):
+        """Detiene el thread de escritura y falla los batches pendientes"""
+        with self._cond:
+            self._stopped = True
+            for agency_queue in self._queues.values():
+                while agency_queue:
+                    pending = agency_queue.popleft()
+                    pending.error = RuntimeError("scheduler stopped")
+                    pending.done.set()
+            self._active.clear()
+            self._cond.notify_all()
+        if self._thread.is_alive():
+            self._thread.join(timeout=5.0)
+
+    def submit(self, agency: str, bets: list) -> None:
+        """
+        Encola un batch de la agencia y bloquea hasta que se almacene.
+        Propaga la excepción si el almacenamiento falla.
+        """
+        pending = _PendingBatch(bets)
+        with self._cond:
+            if self._stopped:
+                raise RuntimeError("scheduler stopped")
+            agency_queue = self._queues.setdefault(agency, deque())
+            if not agency_queue:
+                self._active.append(agency)
+                self._deficits[agency] = 0
+            agency_queue.append(pending)
+
+            stats = self._stats.setdefault(agency, _new_stats())
+            stats['max_depth'] = max(stats['max_depth'], len(agency_queue))
+            self._cond.notify()
+
+        pending.done.wait()
+        if pending.error:
+            raise pending.error
+
+    def queue_depths(self) -> dict:
+        """Cantidad de batches encolados por agencia"""
+        with self._cond:
+            return {agency: len(q) for agency, q in self._queues.items() if q}
+
+    def agency_stats(self, agency: str) -> dict:
+        """
+        Batches almacenados, apuestas almacenadas por ronda en que la agencia
+        fue atendida, espera hasta almacenar (promedio y percentiles, en ms)
+        y profundidad máxima de cola
+        """
+        with self._cond:
+            stats = self._stats.get(agency, _new_stats())
+            batches = stats['batches']
+            waits = sorted(stats['waits'])
+
+        def wait_ms(fraction):
+            return waits[min(len(waits) - 1, int(fraction * len(waits)))] * 1000 if waits else 0.0
+
+        return {
+            'batches': batches,
+            'bets_per_round': stats['bets'] / stats['rounds'] if stats['rounds'] else 0.0,
+            'avg_wait_ms': sum(waits) / len(waits) * 1000 if waits else 0.0,
+            'p50_wait_ms': wait_ms(0.50),
+            'p95_wait_ms': wait_ms(0.95),
+            'max_wait_ms': wait_ms(1.0),
+            'max_depth': stats['max_depth'],
+        }
+
+    def take_wait_average(self) -> float:
+        """Espera promedio (segundos) de los batches almacenados desde la última llamada"""
+        return self._wait_window.take()
+
+    def wait_window(self) -> LatencyWindow:
+        """Ventana adicional que recibe la espera de cada batch almacenado (para otro consumidor)"""
+        window = LatencyWindow()
+        with self._cond:
+            self._wait_windows.append(window)
+        return window
+
+    def _next_round(self) -> list:
+        """Selecciona los batches de la próxima ronda. Debe llamarse con el lock tomado"""
+        selected = []
+        while not selected and self._active:
+            for _ in range(len(self._active)):
+                agency = self._active.popleft()
+                agency_queue = self._queues[agency]
+                # Al menos una apuesta de crédito por ronda: con crédito nulo el loop nunca avanza
+                self._deficits[agency] += max(1, self._quantum * self._weights.get(agency, 1))
+
+                while agency_queue and len(agency_queue[0].bets) <= self._deficits[agency]:
+                    pending = agency_queue.popleft()
+                    self._deficits[agency] -= len(pending.bets)
+                    selected.append((agency, pending))
+
+                if agency_queue:
+                    self._active.append(agency)
+                else:
+                    # Una agencia sin pendientes no acumula crédito
+                    self._deficits[agency] = 0
+        return selected
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._active and not self._stopped:
+                    self._cond.wait()
+                if self._stopped:
+                    return
+                selected = self._next_round()
+                depths = {agency: len(q) for agency, q in self._queues.items() if q}
+
+            logging.debug(f'action: scheduler_round | result: success | batches: {len(selected)} | queue_depths: {depths}')
+
+            error = None
+            try:
+                self._store_fn([bet for _, pending in selected for bet in pending.bets])
+            except Exception as e:
+                error = e
+
+            now = time.monotonic()
+            with self._cond:
+                for agency in {agency for agency, _ in selected}:
+                    self._stats[agency]['rounds'] += 1
+                for agency, pending in selected:
+                    stats = self._stats[agency]
+                    stats['batches'] += 1
+                    stats['bets'] += len(pending.bets)
+                    stats['waits'].append(now - pending.enqueued_at)
+                    for window in self._wait_windows:
+                        window.record(now - pending.enqueued_at)
+
+            for _, pending in selected:
+                pending.error = error
+                pending.done.set()
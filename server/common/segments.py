@@ -0,0 +1,265 @@
+import csv
+import io
+import json
+import logging
+import os
+import struct
+import threading
+from itertools import groupby
+from typing import Optional
+from .utils import STORAGE_FILEPATH, Bet
+
+FOOTER_MAGIC = b'BSEG'
+FOOTER_TRAILER = struct.Struct('!I4s')  # longitud del índice + magic
+
+
+class _Segment:
+    """Segmento inmutable: apuestas ordenadas por agencia con un índice al final"""
+
+    def __init__(self, path: str, agencies: dict, min_number: int, max_number: int):
+        self.path = path
+        self.agencies = agencies  # agencia -> [offset, longitud]
+        self.min_number = min_number
+        self.max_number = max_number
+
+    @classmethod
+    def load(cls, path: str) -> '_Segment':
+        """Lee solo el índice del final del segmento"""
+        with open(path, 'rb') as file:
+            file.seek(-FOOTER_TRAILER.size, os.SEEK_END)
+            footer_length, magic = FOOTER_TRAILER.unpack(file.read(FOOTER_TRAILER.size))
+            if magic != FOOTER_MAGIC:
+                raise ValueError(f"invalid segment footer in {path}")
+            file.seek(-(FOOTER_TRAILER.size + footer_length), os.SEEK_END)
+            footer = json.loads(file.read(footer_length).decode('utf-8'))
+        return cls(path, footer['agencies'], footer['min_number'], footer['max_number'])
+
+    def may_contain(self, agency: Optional[int], number: Optional[int]) -> bool:
+        if agency is not None and str(agency) not in self.agencies:
+            return False
+        if number is not None and not self.min_number <= number <= self.max_number:
+            return False
+        return True
+
+    def ranges(self, agency: Optional[int]) -> list:
+        if agency is None:
+            return list(self.agencies.values())
+        return [self.agencies[str(agency)]]
+
+
+class SegmentStore:
+    """
+    Compacta el archivo de apuestas en segmentos inmutables ordenados por agencia.
+
+    store_bets sigue agregando al archivo activo (STORAGE_FILEPATH). Cuando
+    supera 'threshold' bytes, el thread de compactación lo sella (lo mueve a
+    'directory' con el lock de persistencia tomado, así el próximo store
+    empieza un archivo nuevo) y fuera del lock lo reescribe como segmento:
+    las filas agrupadas por agencia, en orden de llegada dentro de cada una,
+    seguidas de un índice agencia -> (offset, longitud) y el mínimo y máximo
+    número apostado. iter_bets usa ese índice para saltear los segmentos y
+    rangos que no pueden tener apuestas de la agencia o número buscados.
+
+    La compactación es opcional ('threshold' > 0): al sellar, las apuestas
+    salen de STORAGE_FILEPATH, así que load_bets de la cátedra deja de verlas
+    todas y hay que recorrerlas con iter_bets. Con 'threshold' 0 el archivo
+    de apuestas queda completo y el store solo sirve snapshots del activo.
+    """
+
+    DEFAULT_THRESHOLD = 0  # sin compactación: STORAGE_FILEPATH guarda todas las apuestas
+    DEFAULT_INTERVAL = 1.0
+
+    def __init__(self, directory: str, storage_lock: threading.Lock,
+                 threshold: int = DEFAULT_THRESHOLD, interval: float = DEFAULT_INTERVAL):
+        self._directory = directory
+        self._storage_lock = storage_lock
+        self._threshold = threshold
+        self._interval = interval
+
+        # Protege las listas de archivos: los lectores abren todo con el lock tomado
+        self._lock = threading.Lock()
+        self._segments = []
+        self._sealed = []
+        self._next_seq = 0
+        self._stopped = threading.Event()
+        self._thread = None
+
+    @property
+    def enabled(self) -> bool:
+        return self._threshold > 0
+
+    def open(self, clear: bool):
+        """Carga los segmentos existentes, o los borra si el server arranca de cero"""
+        os.makedirs(self._directory, exist_ok=True)
+        for name in sorted(os.listdir(self._directory)):
+            path = os.path.join(self._directory, name)
+            seq, _, kind = name.partition('.')
+            if clear or kind == 'tmp':
+                os.unlink(path)
+                continue
+            if kind == 'seg':
+                self._segments.append(_Segment.load(path))
+            elif kind == 'sealed':
+                # Sellado por un proceso anterior que no llegó a compactarlo
+                self._sealed.append(path)
+            self._next_seq = max(self._next_seq, int(seq) + 1)
+        logging.info(f'action: segments_open | result: success | segments: {len(self._segments)} | '
+                     f'sealed: {len(self._sealed)}')
+
+    def start(self):
+        """Inicia (o reanuda, tras un handoff abortado) la compactación en segundo plano"""
+        if self._thread and self._thread.is_alive():
+            return
+        if self._threshold > 0:
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name="segment_compactor", daemon=True)
+            self._thread.start()
+            logging.info(f'action: compaction_start | result: success | threshold: {self._threshold}')
+
+    def stop(self):
+        """Detiene la compactación esperando a que termine la que está en curso"""
+        self._stopped.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=10.0)
+
+    def _run(self):
+        while not self._stopped.wait(self._interval):
+            try:
+                self.compact()
+            except Exception as e:
+                logging.error(f'action: compaction | result: fail | error: {e}')
+
+    def compact(self, force: bool = False):
+        """Sella el archivo activo si superó el umbral y compacta los sellados pendientes"""
+        self._seal(force)
+        with self._lock:
+            pending = list(self._sealed)
+        for sealed_path in pending:
+            self._compact_sealed(sealed_path)
+
+    def _seal(self, force: bool):
+        with self._storage_lock:
+            try:
+                size = os.path.getsize(STORAGE_FILEPATH)
+            except FileNotFoundError:
+                return
+            if not size or (size < self._threshold and not force):
+                return
+            with self._lock:
+                sealed_path = os.path.join(self._directory, f'{self._next_seq:06d}.sealed')
+                self._next_seq += 1
+                os.rename(STORAGE_FILEPATH, sealed_path)
+                self._sealed.append(sealed_path)
+        logging.debug(f'action: seal_segment | result: success | bytes: {size} | file: {sealed_path}')
+
+    def _compact_sealed(self, sealed_path: str):
+        with open(sealed_path, 'r', newline='') as file:
+            rows = list(csv.reader(file, quoting=csv.QUOTE_MINIMAL))
+
+        # sort es estable: dentro de cada agencia se mantiene el orden de llegada
+        rows.sort(key=lambda row: int(row[0]))
+        data = bytearray()
+        agencies = {}
+        for agency, group in groupby(rows, key=lambda row: int(row[0])):
+            buffer = io.StringIO()
+            csv.writer(buffer, quoting=csv.QUOTE_MINIMAL).writerows(group)
+            encoded = buffer.getvalue().encode('utf-8')
+            agencies[str(agency)] = [len(data), len(encoded)]
+            data += encoded
+
+        numbers = [int(row[5]) for row in rows]
+        footer = json.dumps({
+            'agencies': agencies,
+            'min_number': min(numbers, default=0),
+            'max_number': max(numbers, default=-1),
+        }).encode('utf-8')
+
+        base = os.path.splitext(sealed_path)[0]
+        tmp_path, segment_path = base + '.tmp', base + '.seg'
+        with open(tmp_path, 'wb') as file:
+            file.write(data)
+            file.write(footer)
+            file.write(FOOTER_TRAILER.pack(len(footer), FOOTER_MAGIC))
+        os.replace(tmp_path, segment_path)
+
+        segment = _Segment.load(segment_path)
+        with self._lock:
+            self._sealed.remove(sealed_path)
+            self._segments.append(segment)
+            os.unlink(sealed_path)
+        logging.info(f'action: compaction | result: success | bets: {len(rows)} | agencies: {len(agencies)} | '
+                     f'file: {segment_path}')
+
+    def iter_bets(self, agency: Optional[int] = None, number: Optional[int] = None):
+        """
+        Recorre las apuestas guardadas (segmentos, sellados y archivo activo),
+        opcionalmente solo las de 'agency' y/o con 'number'. Dentro de una
+        agencia se respeta el orden de llegada.
+        """
+        yield from self._iter_sources(self._open_sources(agency, number), agency, number)
+
+    def snapshot(self):
+        """
+        Fija las apuestas guardadas hasta este momento y retorna un iterador
+        sobre ellas que puede consumirse sin ningún lock: los archivos quedan
+        abiertos y del activo solo se leen los bytes que tenía al tomarlo.
+        Debe llamarse con el lock de persistencia tomado.
+        """
+        return self._iter_sources(self._open_sources(None, None, pin_active=True), None, None)
+
+    def _open_sources(self, agency: Optional[int], number: Optional[int], pin_active: bool = False) -> list:
+        sources = []
+        with self._lock:
+            # Los archivos quedan abiertos: la compactación puede borrarlos mientras se leen
+            for segment in self._segments:
+                if segment.may_contain(agency, number):
+                    sources.append((open(segment.path, 'rb'), segment.ranges(agency), None))
+            for path in self._sealed + [STORAGE_FILEPATH]:
+                try:
+                    file = open(path, 'rb')
+                except FileNotFoundError:
+                    continue
+                limit = os.fstat(file.fileno()).st_size if pin_active and path == STORAGE_FILEPATH else None
+                sources.append((file, None, limit))
+        return sources
+
+    def _iter_sources(self, sources: list, agency: Optional[int], number: Optional[int]):
+        try:
+            for file, ranges, limit in sources:
+                for row in self._iter_rows(file, ranges, limit):
+                    if agency is not None and int(row[0]) != agency:
+                        continue
+                    if number is not None and int(row[5]) != number:
+                        continue
+                    yield Bet(row[0], row[1], row[2], row[3], row[4], row[5])
+        finally:
+            for file, _, _ in sources:
+                file.close()
+
+    def _iter_rows(self, file, ranges, limit: Optional[int] = None):
+        """Filas CSV de los rangos (offset, longitud) indicados, o de todo el archivo hasta 'limit' bytes"""
+        if limit is not None:
+            # Cada store agrega filas completas: el límite cae siempre al final de una fila
+            yield from csv.reader((line.decode('utf-8') for line in _lines_until(file, limit)), quoting=csv.QUOTE_MINIMAL)
+            return
+        if ranges is None:
+            yield from csv.reader(io.TextIOWrapper(file, encoding='utf-8', newline=''), quoting=csv.QUOTE_MINIMAL)
+            return
+        for offset, length in ranges:
+            file.seek(offset)
+            text = file.read(length).decode('utf-8')
+            yield from csv.reader(io.StringIO(text, newline=''), quoting=csv.QUOTE_MINIMAL)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'segments': len(self._segments), 'sealed': len(self._sealed)}
+
+
+def _lines_until(file, limit: int):
+    """Líneas del archivo binario hasta consumir 'limit' bytes"""
+    consumed = 0
+    for line in file:
+        consumed += len(line)
+        if consumed > limit:
+            return
+        yield line
@@ -5,47 +5,237 @@ import sys
 import threading
 import os
 import queue
-from concurrent.futures import ThreadPoolExecutor
+import select
+import stat
+import struct
+import time
+from concurrent.futures import wait
+from .batching import BatchSizeAdvisor
+from .buffers import BufferPool
+from .capture import TrafficRecorder
+from .diagnostics import Diagnostics
+from .handoff import HandoffListener, request_handoff
+from .pool import ElasticPool
 from .protocol import Protocol
+from .replication import ReplicationPublisher
+from .scheduler import BatchScheduler
+from .segments import SegmentStore
+from .utils import STORAGE_FILEPATH, LOTTERY_WINNER_NUMBER, store_bets
 
 
 class Server:
-    def __init__(self, port, listen_backlog):
-        # Initialize server socket
-        self._server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self._server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        self._server_socket.bind(('', port))
-        self._server_socket.listen(listen_backlog)
+    HANDOFF_DRAIN_TIMEOUT = 10.0  # segundos máximos esperando a los handlers al drenar
+
+    def __init__(self, port, listen_backlog, replication_port=0, handoff_path='', unix_socket_path=''):
+        # Si hay un proceso anterior se heredan sus sockets de escucha y su estado
+        handoff = request_handoff(handoff_path) if handoff_path else None
+        handoff_state = None
+        inherited = []
+        if handoff:
+            inherited, handoff_state = handoff
+        if inherited:
+            self._server_socket = inherited[0]
+        else:
+            # Initialize server socket
+            self._server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self._server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            self._server_socket.bind(('', port))
+            self._server_socket.listen(listen_backlog)
+        
+        # Listener Unix opcional para agencias en el mismo host (mismo protocolo y handler)
+        self._unix_socket_path = unix_socket_path
+        self._unix_socket = None
+        if len(inherited) > 1:
+            if unix_socket_path:
+                self._unix_socket = inherited[1]
+            else:
+                inherited[1].close()
+        elif unix_socket_path:
+            self._unix_socket = self._bind_unix_socket(unix_socket_path, listen_backlog)
+        self._listeners = [sock for sock in (self._server_socket, self._unix_socket) if sock]
+        self._handed_off = False
         
         # Flag to control graceful shutdown
         self._shutdown_requested = False
         self._active_connections = []
         self._connections_lock = threading.Lock()
         
-        # Thread pool for handling client connections
-        self._max_workers = int(os.environ.get('MAX_WORKERS', 5))
-        self._thread_pool = ThreadPoolExecutor(max_workers=self._max_workers, thread_name_prefix="client_handler")
-        self._active_futures = set()
-        self._futures_lock = threading.Lock()
+        # Handoff a un proceso nuevo: se deja de aceptar y se drenan las conexiones
+        self._draining = threading.Event()
+        self._accept_lock = threading.Lock()
         
         # Lock para proteger las operaciones de persistencia (funciones de la cátedra)
         self._storage_lock = threading.Lock()
         
+        # Scheduler que intercala los batches de las agencias antes de almacenarlos
+        self._scheduler = BatchScheduler(
+            self._store_bets_locked,
+            quantum=self._parse_scheduler_quantum(os.environ.get('SCHEDULER_QUANTUM', str(BatchScheduler.DEFAULT_QUANTUM))),
+            weights=self._parse_agency_weights(os.environ.get('AGENCY_WEIGHTS', '')),
+        )
+        
+        # Elastic thread pool for handling client connections
+        self._min_workers = int(os.environ.get('MIN_WORKERS', 2))
+        self._max_workers = int(os.environ.get('MAX_WORKERS', 16))
+        self._thread_pool = ElasticPool(self._min_workers, self._max_workers, "client_handler",
+                                        contention_fn=self._scheduler.take_wait_average)
+        self._active_futures = set()
+        self._futures_lock = threading.Lock()
+        
+        # Tamaño de batch recomendado a los clientes en cada ack
+        self._batch_advisor = BatchSizeAdvisor(Protocol.MAX_MESSAGE_SIZE, contention_fn=self._scheduler.wait_window().take)
+        
+        # Presupuesto global de memoria para los mensajes en vuelo de todas las conexiones.
+        # Cada conexión tiene a lo sumo un buffer prestado, así que un presupuesto de
+        # MAX_WORKERS buffers o más nunca frena a nadie: por defecto se admite la mitad
+        buffer_size = Protocol.MAX_MESSAGE_SIZE + 1  # payload + delimitador
+        default_budget = max(1, self._max_workers // 2) * buffer_size
+        self._buffer_pool = BufferPool(int(os.environ.get('MEMORY_BUDGET_BYTES', default_budget)), buffer_size)
+        
+        # Captura de tráfico para reproducirlo con replay.py (opcional)
+        capture_file = os.environ.get('CAPTURE_FILE', '')
+        self._recorder = TrafficRecorder(capture_file) if capture_file else None
+        
         # Protocol for handling bets (with storage lock for thread safety)
-        self._protocol = Protocol(self._storage_lock)
+        self._protocol = Protocol(self._storage_lock, self._scheduler, self._buffer_pool, self._recorder)
+        
+        # Compactación opcional del archivo de apuestas en segmentos ordenados por agencia.
+        # Con COMPACTION_THRESHOLD_BYTES > 0 las apuestas compactadas salen de STORAGE_FILEPATH
+        self._store = SegmentStore(
+            os.environ.get('SEGMENTS_DIR', './segments'),
+            self._storage_lock,
+            threshold=int(os.environ.get('COMPACTION_THRESHOLD_BYTES', SegmentStore.DEFAULT_THRESHOLD)),
+            interval=float(os.environ.get('COMPACTION_INTERVAL', SegmentStore.DEFAULT_INTERVAL)),
+        )
         
         # State for tracking finished agencies and lottery status
         self._finished_agencies = set()
+        self._finished_streams = {}  # agencia -> índices de stream que enviaron MSG_FINISHED
         self._lottery_completed = False
         self._expected_agencies = self._detect_expected_agencies()
         self._state_lock = threading.Lock()
         
-        # Limpiar archivo de apuestas al iniciar el servidor
-        self._clear_bets_file()
+        if handoff_state:
+            # Continuar desde el estado del proceso anterior
+            self._finished_agencies = set(handoff_state['finished_agencies'])
+            self._finished_streams = {agency: set(streams) for agency, streams in handoff_state.get('finished_streams', {}).items()}
+            self._lottery_completed = handoff_state['lottery_completed']
+            self._restore_bets_file(handoff_state['storage_position'])
+        else:
+            # Limpiar archivo de apuestas al iniciar el servidor
+            self._clear_bets_file()
+        # Los segmentos del proceso anterior solo se conservan al heredar su estado
+        self._store.open(clear=not handoff_state)
+        
+        # Publicación del log de apuestas a followers de solo lectura (opcional)
+        self._replication_port = replication_port
+        self._listen_backlog = listen_backlog
+        self._publisher = self._create_publisher() if replication_port else None
         
         # Set up signal handlers
         signal.signal(signal.SIGTERM, self._signal_handler)
         signal.signal(signal.SIGINT, self._signal_handler)
+        
+        # Profiling y trazas de memoria bajo demanda (SIGUSR1 / SIGUSR2)
+        self._diagnostics = Diagnostics(
+            os.environ.get('DIAGNOSTICS_DIR', './diagnostics'),
+            float(os.environ.get('PROFILE_SECONDS', 10)),
+        )
+        self._diagnostics.install(signal.SIGUSR1, signal.SIGUSR2)
+        
+        self._scheduler.start()
+        self._store.start()
+        if self._publisher:
+            self._publisher.start()
+        
+        self._handoff_listener = None
+        if handoff_path:
+            self._handoff_listener = HandoffListener(handoff_path, self._prepare_handoff, self._handoff_completed, self._handoff_aborted)
+            self._handoff_listener.start()
+
+    def _create_publisher(self) -> ReplicationPublisher:
+        # Los followers que se (re)conectan reciben también las agencias finalizadas antes de un handoff
+        with self._state_lock:
+            finished = sorted(self._finished_agencies)
+        return ReplicationPublisher(self._replication_port, self._listen_backlog, self._storage_lock, self._protocol,
+                                    snapshot_fn=self._store.snapshot, finished=finished)
+
+    def _bind_unix_socket(self, path: str, listen_backlog: int) -> socket.socket:
+        """
+        Crea el listener Unix. Solo descarta lo que haya en el path si es un
+        socket viejo sin nadie escuchando: un path mal configurado no borra archivos
+        """
+        if os.path.lexists(path):
+            if not self._is_stale_socket(path):
+                logging.error(f'action: unix_listen | result: fail | path: {path} | '
+                              f'error: path exists and is not a stale socket')
+                raise FileExistsError(f"{path} exists and is not a stale socket")
+            os.unlink(path)
+        unix_socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        unix_socket.bind(path)
+        unix_socket.listen(listen_backlog)
+        logging.info(f'action: unix_listen | result: success | path: {path}')
+        return unix_socket
+
+    def _is_stale_socket(self, path: str) -> bool:
+        """True si el path es un socket Unix que rechaza conexiones (su proceso ya no existe)"""
+        try:
+            if not stat.S_ISSOCK(os.stat(path).st_mode):
+                return False
+        except FileNotFoundError:
+            return False
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(path)
+        except ConnectionRefusedError:
+            return True
+        except OSError:
+            return False
+        finally:
+            probe.close()
+        # Hay un proceso escuchando en el path
+        return False
+
+    def _peer_ip(self, client_sock: socket.socket, addr=None) -> str:
+        """IP del cliente para los logs; las conexiones Unix no tienen una"""
+        if client_sock.family == socket.AF_UNIX:
+            return 'unix'
+        return (addr or client_sock.getpeername())[0]
+
+    def _store_bets_locked(self, bets):
+        """Almacena apuestas tomando el lock de persistencia"""
+        with self._storage_lock:
+            store_bets(bets)
+            if self._publisher:
+                self._publisher.publish_bets(bets)
+
+    def _parse_scheduler_quantum(self, raw: str) -> int:
+        """Apuestas de crédito por ronda con peso 1; debe ser positivo para que las agencias avancen"""
+        try:
+            quantum = int(raw)
+            if quantum > 0:
+                return quantum
+        except ValueError:
+            pass
+        logging.error(f'action: parse_scheduler_quantum | result: fail | value: {raw} | '
+                      f'using: {BatchScheduler.DEFAULT_QUANTUM}')
+        return BatchScheduler.DEFAULT_QUANTUM
+
+    def _parse_agency_weights(self, raw: str) -> dict:
+        """
+        Parsea pesos de scheduling con formato 'agencia:peso,agencia:peso'.
+        Las entradas inválidas o con peso no positivo se ignoran (la agencia queda con peso 1).
+        """
+        weights = {}
+        for entry in filter(None, (e.strip() for e in raw.split(','))):
+            try:
+                agency, weight = entry.split(':')
+                if int(weight) <= 0:
+                    raise ValueError(weight)
+                weights[agency.strip()] = int(weight)
+            except ValueError:
+                logging.error(f'action: parse_agency_weights | result: fail | entry: {entry} | using: 1')
+        return weights
 
     def _detect_expected_agencies(self) -> int:
         """Detecta automáticamente cuántas agencias se esperan usando variables de entorno"""
@@ -72,12 +262,33 @@ class Server:
         self._shutdown_requested = True
         self._graceful_shutdown()
 
-    def _mark_agency_finished(self, agency_id: str):
-        """Marca una agencia como finalizada y verifica si todas terminaron"""
+    def _mark_agency_finished(self, agency_id: str, stream_index: int = 0, stream_count: int = 1) -> bool:
+        """
+        Registra la finalización de un stream de la agencia. La agencia queda
+        finalizada recién cuando todos sus streams enviaron MSG_FINISHED.
+        """
         with self._state_lock:
+            streams = self._finished_streams.setdefault(agency_id, set())
+            streams.add(stream_index)
+            logging.info(f'action: agency_stream_finished | result: success | agency: {agency_id} | '
+                         f'stream: {stream_index} | streams_finished: {len(streams)}/{stream_count}')
+            if len(streams) < stream_count or agency_id in self._finished_agencies:
+                return False
             self._finished_agencies.add(agency_id)
             logging.info(f'action: agency_finished | result: success | agency: {agency_id}')
-            
+        
+        if self._publisher:
+            self._publisher.publish_finished(agency_id)
+        
+        stats = self._scheduler.agency_stats(agency_id)
+        logging.info(f'action: agency_queue_stats | result: success | agency: {agency_id} | '
+                     f'batches: {stats["batches"]} | bets_per_round: {stats["bets_per_round"]:.1f} | '
+                     f'avg_wait_ms: {stats["avg_wait_ms"]:.2f} | p50_wait_ms: {stats["p50_wait_ms"]:.2f} | '
+                     f'p95_wait_ms: {stats["p95_wait_ms"]:.2f} | max_wait_ms: {stats["max_wait_ms"]:.2f}')
+        usage = self._buffer_pool.usage()
+        logging.info(f'action: memory_budget | result: success | in_use: {usage["in_use"]} | '
+                     f'peak: {usage["peak"]} | budget: {usage["budget"]} | waiting: {usage["waiting"]}')
+        return True
     
     def _clear_bets_file(self):
         """Limpia el archivo de apuestas al iniciar el servidor"""
@@ -89,20 +300,103 @@ class Server:
         except Exception as e:
             logging.error(f'action: clear_bets_file | result: fail | error: {e}')
     
-    def _get_winners_for_agency(self, agency_id: str) -> list[str]:
-        """Obtiene los ganadores de una agencia específica"""
+    def _restore_bets_file(self, position: int):
+        """Descarta cualquier escritura posterior a la posición heredada en el handoff"""
+        try:
+            # 'a+' crea el archivo si la compactación lo había sellado antes del handoff
+            with open(STORAGE_FILEPATH, 'a+') as file:
+                size = file.seek(0, os.SEEK_END)
+                if size > position:
+                    file.truncate(position)
+            logging.info(f'action: restore_bets_file | result: success | position: {position} | size: {size}')
+        except Exception as e:
+            logging.error(f'action: restore_bets_file | result: fail | error: {e}')
+    
+    def _prepare_handoff(self):
+        """
+        Deja de aceptar conexiones, drena las activas y retorna el socket de
+        escucha junto con el estado que necesita el proceso nuevo. Si alguna
+        conexión no termina en HANDOFF_DRAIN_TIMEOUT el handoff se aborta
+        """
+        # Con el lock tomado no hay un accept en curso: nada se acepta después de esto
+        with self._accept_lock:
+            self._draining.set()
+        
+        # Cortar la lectura: cada handler termina el mensaje en curso y cierra
+        with self._connections_lock:
+            for client_sock in self._active_connections:
+                try:
+                    client_sock.shutdown(socket.SHUT_RD)
+                except OSError:
+                    pass
+        
+        with self._futures_lock:
+            pending = set(self._active_futures)
+        done, not_done = wait(pending, timeout=self.HANDOFF_DRAIN_TIMEOUT)
+        if not_done:
+            # Un handler vivo podría almacenar después de tomar la posición y el proceso nuevo lo truncaría
+            logging.error(f'action: handoff_drain | result: fail | drained: {len(done)} | pending: {len(not_done)}')
+            raise RuntimeError(f"{len(not_done)} handlers still running after {self.HANDOFF_DRAIN_TIMEOUT}s")
+        logging.info(f'action: handoff_drain | result: success | drained: {len(done)}')
+        
+        # El proceso nuevo sigue agregando al mismo trace
+        if self._recorder:
+            self._recorder.flush()
+        
+        # El proceso nuevo abre su propio puerto de replicación
+        if self._publisher:
+            self._publisher.stop()
+        
+        # Sin compactación en curso el archivo activo no cambia de lugar
+        self._store.stop()
+        
+        with self._storage_lock:
+            try:
+                position = os.path.getsize(STORAGE_FILEPATH)
+            except FileNotFoundError:
+                # Recién sellado por la compactación: el proceso nuevo empieza un archivo vacío
+                position = 0
+        with self._state_lock:
+            state = {
+                'finished_agencies': sorted(self._finished_agencies),
+                'finished_streams': {agency: sorted(streams) for agency, streams in self._finished_streams.items()},
+                'lottery_completed': self._lottery_completed,
+                'storage_position': position,
+            }
+        return self._listeners, state
+    
+    def _handoff_completed(self):
+        """El proceso nuevo ya tiene los sockets: este proceso termina"""
+        self._handed_off = True
+        self._shutdown_requested = True
+    
+    def _handoff_aborted(self):
+        """El handoff falló: se vuelve a aceptar conexiones"""
+        logging.error('action: handoff | result: fail | resuming: true')
+        self._store.start()
+        # El puerto de replicación ya se había liberado para el proceso nuevo
+        if self._publisher and self._publisher.stopped:
+            self._publisher = self._create_publisher()
+            self._publisher.start()
+        self._draining.clear()
+    
+    def _iter_winners_for_agency(self, agency_id: str):
+        """Recorre las apuestas y produce los DNIs ganadores de una agencia específica"""
         try:
             from .utils import load_bets, has_won
             
-            winners = []
-            for bet in load_bets():
+            if self._store.enabled:
+                # Parte de las apuestas ya no está en el archivo: los segmentos sin esa agencia
+                # o sin el número ganador no se leen
+                bets = self._store.iter_bets(int(agency_id), LOTTERY_WINNER_NUMBER)
+            else:
+                bets = load_bets()
+            for bet in bets:
                 if str(bet.agency) == agency_id and has_won(bet):
-                    winners.append(bet.document)
-            
-            return winners
+                    yield bet.document
         except Exception as e:
             logging.error(f'action: get_winners | result: fail | agency: {agency_id} | error: {e}')
-            return []
+            raise
     
     def _graceful_shutdown(self):
         """Perform graceful shutdown of all resources"""
@@ -118,6 +412,37 @@ class Server:
                 except Exception as e:
                     logging.error(f'action: close_client_connection | result: fail | error: {e}')
         
+        # Stop listening for handoff requests (the path may belong to the new process)
+        if self._handoff_listener:
+            self._handoff_listener.close()
+        
+        # Stop batch scheduler (fails pending batches so handlers can exit)
+        try:
+            logging.info('action: stop_scheduler | result: in_progress')
+            self._scheduler.stop()
+            logging.info('action: stop_scheduler | result: success')
+        except Exception as e:
+            logging.error(f'action: stop_scheduler | result: fail | error: {e}')
+        
+        # Wake handlers waiting for memory budget so they can exit
+        self._buffer_pool.close()
+        
+        # Stop background compaction
+        self._store.stop()
+        
+        # Flush the traffic capture
+        if self._recorder:
+            self._recorder.close()
+        
+        # Stop replication to followers
+        if self._publisher:
+            try:
+                logging.info('action: stop_replication | result: in_progress')
+                self._publisher.stop()
+                logging.info('action: stop_replication | result: success')
+            except Exception as e:
+                logging.error(f'action: stop_replication | result: fail | error: {e}')
+        
         # Shutdown thread pool gracefully
         try:
             logging.info('action: shutdown_thread_pool | result: in_progress')
@@ -134,6 +459,16 @@ class Server:
         except Exception as e:
             logging.error(f'action: close_server_socket | result: fail | error: {e}')
         
+        # Close unix listener (after a handoff the path belongs to the new process)
+        if self._unix_socket:
+            try:
+                self._unix_socket.close()
+                if not self._handed_off and os.path.exists(self._unix_socket_path):
+                    os.unlink(self._unix_socket_path)
+                logging.info('action: close_unix_socket | result: success')
+            except Exception as e:
+                logging.error(f'action: close_unix_socket | result: fail | error: {e}')
+        
         logging.info('action: graceful_shutdown | result: success')
         sys.exit(0)
 
@@ -145,24 +480,43 @@ class Server:
         with multiple clients concurrently using a thread pool.
         """
 
-        logging.info(f'action: server_start | result: success | max_workers: {self._max_workers}')
+        logging.info(f'action: server_start | result: success | min_workers: {self._min_workers} | max_workers: {self._max_workers}')
         
         while not self._shutdown_requested:
             try:
-                # Set a timeout on accept to allow checking shutdown flag
-                self._server_socket.settimeout(1.0)
-                client_sock = self.__accept_new_connection()
-                if client_sock:
-                    # Submit client connection to thread pool for concurrent processing
-                    future = self._thread_pool.submit(self.__handle_client_connection, client_sock)
-                    
-                    # Track active futures for cleanup
-                    with self._futures_lock:
-                        self._active_futures.add(future)
-                        # Clean up completed futures
-                        self._active_futures = {f for f in self._active_futures if not f.done()}
+                if self._draining.is_set():
+                    # Handoff en curso: las conexiones pendientes quedan para el proceso nuevo
+                    time.sleep(0.1)
+                    continue
+                
+                # Wait for connections with a timeout to allow checking shutdown flag
+                readable, _, _ = select.select(self._listeners, [], [], 1.0)
+                if not readable:
+                    continue
+                
+                with self._accept_lock:
+                    if self._draining.is_set():
+                        continue
                     
-                    logging.info(f'action: client_submitted_to_pool | result: success | active_connections: {len(self._active_futures)}')
+                    for listener in readable:
+                        listener.settimeout(1.0)
+                        client_sock = self.__accept_new_connection(listener)
+                        if not client_sock:
+                            continue
+                        # Register before submitting so a handoff drain always sees it
+                        with self._connections_lock:
+                            self._active_connections.append(client_sock)
+                        
+                        # Submit client connection to thread pool for concurrent processing
+                        future = self._thread_pool.submit(self.__handle_client_connection, client_sock)
+                        
+                        # Track active futures for cleanup
+                        with self._futures_lock:
+                            self._active_futures.add(future)
+                            # Clean up completed futures
+                            self._active_futures = {f for f in self._active_futures if not f.done()}
+                        
+                        logging.info(f'action: client_submitted_to_pool | result: success | active_connections: {len(self._active_futures)}')
                     
             except socket.timeout:
                 # Timeout occurred, check if shutdown was requested
@@ -182,94 +536,110 @@ class Server:
         If a problem arises in the communication with the client, the
         client socket will also be closed
         """
-        # Add connection to active list
-        with self._connections_lock:
-            self._active_connections.append(client_sock)
-        
         # Log thread information for monitoring
         thread_name = threading.current_thread().name
         logging.info(f'action: client_handler_started | result: success | thread: {thread_name}')
         
         try:
-            addr = client_sock.getpeername()
+            ip = self._peer_ip(client_sock)
             # Process multiple messages until connection is closed or error occurs
             while True:
                 try:
+                    if self._draining.is_set():
+                        logging.info(f'action: client_drained | result: success | ip: {ip}')
+                        break
+                    
                     # Receive message to determine type
                     result = self._protocol.receive_message(client_sock)
                     if not result:
-                        logging.info(f'action: client_disconnected | result: success | ip: {addr[0]}')
+                        logging.info(f'action: client_disconnected | result: success | ip: {ip}')
                         break
                     
                     msg_type, payload = result
+                    try:
+                        # Process different message types
+                        if msg_type == self._protocol.MSG_BET:
+                            success = self._protocol._process_bet_from_payload(client_sock, payload)
+                            if success:
+                                logging.info(f'action: bet_processed | result: success | ip: {ip}')
+                            else:
+                                logging.error(f'action: bet_processed | result: fail | ip: {ip}')
+                                break
                     
-                    # Process different message types
-                    if msg_type == self._protocol.MSG_BET:
-                        success = self._protocol._process_bet_from_payload(client_sock, payload)
-                        if success:
-                            logging.info(f'action: bet_processed | result: success | ip: {addr[0]}')
-                        else:
-                            logging.error(f'action: bet_processed | result: fail | ip: {addr[0]}')
-                            break
-                    
-                    elif msg_type == self._protocol.MSG_BATCH:
-                        success = self._protocol._process_batch_from_payload(client_sock, payload)
-                        if success:
-                            logging.info(f'action: batch_processed | result: success | ip: {addr[0]}')
-                        else:
-                            logging.error(f'action: batch_processed | result: fail | ip: {addr[0]}')
-                            break
+                        elif msg_type == self._protocol.MSG_BATCH:
+                            started_at = time.monotonic()
+                            success = self._protocol._process_batch_from_payload(client_sock, payload, self._batch_advisor.recommended())
+                            elapsed = time.monotonic() - started_at
+                            self._thread_pool.record_ack_latency(elapsed)
+                            if success:
+                                self._batch_advisor.record(struct.unpack_from('!I', payload)[0], len(payload), elapsed)
+                                logging.info(f'action: batch_processed | result: success | ip: {ip}')
+                            else:
+                                logging.error(f'action: batch_processed | result: fail | ip: {ip}')
+                                break
                     
-                    elif msg_type == self._protocol.MSG_FINISHED:
-                        # Handle finished notification
-                        try:
-                            offset = 0
-                            agency_id, _ = self._protocol._decode_string(payload, offset)
-                            # Mark agency as finished
-                            self._mark_agency_finished(agency_id)
-                            # Send acknowledgment
-                            self._protocol.send_finished_ack(client_sock, True)
-                            logging.info(f'action: finished_notification | result: success | agency: {agency_id}')
-                        except Exception as e:
-                            self._protocol.send_finished_ack(client_sock, False)
-                            logging.error(f'action: finished_notification | result: fail | ip: {addr[0]} | error: {e}')
-                            break
+                        elif msg_type == self._protocol.MSG_FINISHED:
+                            # Handle finished notification
+                            try:
+                                agency_id, stream_index, stream_count = self._protocol.decode_finished(payload)
+                                # Mark agency stream as finished
+                                self._mark_agency_finished(agency_id, stream_index, stream_count)
+                                # Send acknowledgment
+                                self._protocol.send_finished_ack(client_sock, True)
+                                logging.info(f'action: finished_notification | result: success | agency: {agency_id}')
+                            except Exception as e:
+                                self._protocol.send_finished_ack(client_sock, False)
+                                logging.error(f'action: finished_notification | result: fail | ip: {ip} | error: {e}')
+                                break
                     
-                    elif msg_type == self._protocol.MSG_WINNERS_QUERY:
-                        # Handle winners query
-                        try:
-                            offset = 0
-                            agency_id, _ = self._protocol._decode_string(payload, offset)
-                            # Check if lottery is completed
-                            with self._state_lock:
-                                if not self._lottery_completed and len(self._finished_agencies) >= self._expected_agencies:
-                                    logging.info(f'action: sorteo | result: success')
-
-                                if len(self._finished_agencies) >= self._expected_agencies:
+                        elif msg_type == self._protocol.MSG_WINNERS_QUERY:
+                            # Handle winners query
+                            try:
+                                offset = 0
+                                agency_id, _ = self._protocol._decode_string(payload, offset)
+                                # Check if lottery is completed
+                                with self._state_lock:
+                                    finished = len(self._finished_agencies)
+                                    completed = finished >= self._expected_agencies
+                                    if completed and not self._lottery_completed:
                                         self._lottery_completed = True
-                                        winners = self._get_winners_for_agency(agency_id)
-                                        self._protocol.send_winners_response(client_sock, winners)
+                                        logging.info(f'action: sorteo | result: success')
+                            
+                                if completed and not agency_id.isdigit():
+                                    # Validar antes de empezar el stream: un error a mitad de camino
+                                    # cortaría la conexión sin MSG_WINNERS_END
+                                    logging.error(f'action: winners_query | result: fail | ip: {ip} | agency: {agency_id} | error: invalid agency id')
+                                    if not self._protocol.send_winners_response(client_sock, []):
+                                        break
+                                elif completed:
+                                    # Los ganadores se envían en chunks a medida que se recorre el archivo,
+                                    # sin tomar el lock de estado durante el envío
+                                    if not self._protocol.send_winners_response(client_sock, self._iter_winners_for_agency(agency_id)):
+                                        break
                                 else:
                                     # Send to the client that the lottery is not completed
-                                    logging.info(f'action: sorteo | result: in_progress | agencies_finished: {len(self._finished_agencies)}/{self._expected_agencies}')
-                                    self._protocol.send_retry_response(client_sock, f"Lottery not completed yet. {len(self._finished_agencies)}/{self._expected_agencies} agencies finished.")
+                                    logging.info(f'action: sorteo | result: in_progress | agencies_finished: {finished}/{self._expected_agencies}')
+                                    self._protocol.send_retry_response(client_sock, f"Lottery not completed yet. {finished}/{self._expected_agencies} agencies finished.")
                         
-                        except Exception as e:
-                            logging.error(f'action: winners_query | result: fail | ip: {addr[0]} | error: {e}')
-                            break
+                            except Exception as e:
+                                logging.error(f'action: winners_query | result: fail | ip: {ip} | error: {e}')
+                                break
                     
-                    else:
-                        logging.error(f'action: unknown_message | result: fail | type: {msg_type} | ip: {addr[0]}')
-                        break
+                        else:
+                            logging.error(f'action: unknown_message | result: fail | type: {msg_type} | ip: {ip}')
+                            break
+                    finally:
+                        # El buffer del pool vuelve a estar disponible para otras conexiones
+                        self._protocol.release_payload(payload)
                         
                 except (OSError, ConnectionResetError, BrokenPipeError) as e:
                     # Connection was closed by client or network error
-                    logging.info(f'action: client_disconnected | result: success | ip: {addr[0]}')
+                    logging.info(f'action: client_disconnected | result: success | ip: {ip}')
                     break
                 except Exception as e:
                     # Check if it's a connection closed error from receive_message
                     if "connection closed" in str(e).lower():
-                        logging.info(f'action: client_disconnected | result: success | ip: {addr[0]}')
+                        logging.info(f'action: client_disconnected | result: success | ip: {ip}')
                         break
                     logging.error(f"action: message_processed | result: fail | error: {e}")
                     break
@@ -283,7 +653,7 @@ class Server:
             client_sock.close()
             logging.info(f'action: client_handler_finished | result: success | thread: {threading.current_thread().name}')
 
-    def __accept_new_connection(self):
+    def __accept_new_connection(self, listener):
         """
         Accept new connections
 
@@ -293,6 +663,6 @@ class Server:
 
         # Connection arrived
         logging.info('action: accept_connections | result: in_progress')
-        c, addr = self._server_socket.accept()
-        logging.info(f'action: accept_connections | result: success | ip: {addr[0]}')
+        c, addr = listener.accept()
+        logging.info(f'action: accept_connections | result: success | ip: {self._peer_ip(c, addr)}')
         return c
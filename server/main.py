@@ -2,6 +2,7 @@
 
 from configparser import ConfigParser
 from common.server import Server
+from common.follower import FollowerServer
 import logging
 import os
 
@@ -26,6 +27,11 @@ def initialize_config():
         config_params["port"] = int(os.getenv('SERVER_PORT', config["DEFAULT"]["SERVER_PORT"]))
         config_params["listen_backlog"] = int(os.getenv('SERVER_LISTEN_BACKLOG', config["DEFAULT"]["SERVER_LISTEN_BACKLOG"]))
         config_params["logging_level"] = os.getenv('LOGGING_LEVEL', config["DEFAULT"]["LOGGING_LEVEL"])
+        config_params["mode"] = os.getenv('SERVER_MODE', config["DEFAULT"]["SERVER_MODE"])
+        config_params["replication_port"] = int(os.getenv('REPLICATION_PORT', config["DEFAULT"]["REPLICATION_PORT"]))
+        config_params["primary_address"] = os.getenv('PRIMARY_ADDRESS', config["DEFAULT"]["PRIMARY_ADDRESS"])
+        config_params["handoff_socket"] = os.getenv('HANDOFF_SOCKET', config["DEFAULT"]["HANDOFF_SOCKET"])
+        config_params["unix_socket"] = os.getenv('SERVER_UNIX_SOCKET', config["DEFAULT"]["SERVER_UNIX_SOCKET"])
     except KeyError as e:
         raise KeyError("Key was not found. Error: {} .Aborting server".format(e))
     except ValueError as e:
@@ -39,16 +45,26 @@ def main():
     logging_level = config_params["logging_level"]
     port = config_params["port"]
     listen_backlog = config_params["listen_backlog"]
+    mode = config_params["mode"]
+    replication_port = config_params["replication_port"]
+    primary_address = config_params["primary_address"]
+    handoff_socket = config_params["handoff_socket"]
+    unix_socket = config_params["unix_socket"]
 
     initialize_log(logging_level)
 
     # Log config parameters at the beginning of the program to verify the configuration
     # of the component
     logging.debug(f"action: config | result: success | port: {port} | "
-                  f"listen_backlog: {listen_backlog} | logging_level: {logging_level}")
+                  f"listen_backlog: {listen_backlog} | logging_level: {logging_level} | "
+                  f"mode: {mode} | replication_port: {replication_port} | primary_address: {primary_address} | "
+                  f"handoff_socket: {handoff_socket} | unix_socket: {unix_socket}")
 
     # Initialize server and start server loop
-    server = Server(port, listen_backlog)
+    if mode == "follower":
+        server = FollowerServer(port, listen_backlog, primary_address)
+    else:
+        server = Server(port, listen_backlog, replication_port, handoff_socket, unix_socket)
     server.run()
 
 def initialize_log(logging_level):
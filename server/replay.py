@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import logging
+import os
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from common.capture import Replayer, read_trace
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Replay a traffic capture (CAPTURE_FILE) against a server")
+    parser.add_argument("trace", help="capture file written by the server")
+    parser.add_argument("--address", default="localhost:12345", help="server address (host:port)")
+    parser.add_argument("--unix", help="also replay through this Unix socket (SERVER_UNIX_SOCKET) and compare with TCP")
+    parser.add_argument("--realtime", action="store_true", help="keep the original timing instead of max speed")
+    parser.add_argument("--spawn", action="store_true", help="start a fresh server (main.py) for each replay")
+    parser.add_argument("--output", help="write the report as JSON to this file")
+    return parser.parse_args()
+
+
+def spawn_server(port: int, unix_path: str, workdir: str) -> subprocess.Popen:
+    """
+    Inicia un server nuevo en 'workdir' y espera a que acepte conexiones.
+    Sus apuestas y segmentos quedan en 'workdir', no en el checkout.
+    """
+    source_dir = os.path.dirname(os.path.abspath(__file__))
+    shutil.copy(os.path.join(source_dir, "config.ini"), workdir)
+    env = dict(os.environ, SERVER_PORT=str(port), SERVER_UNIX_SOCKET=unix_path or '')
+    # Ni grabar el propio replay en el trace, ni pedirle el handoff a un server en marcha,
+    # ni borrar segmentos fuera de 'workdir'
+    for name in ('CAPTURE_FILE', 'HANDOFF_SOCKET', 'SEGMENTS_DIR'):
+        env.pop(name, None)
+    server = subprocess.Popen([sys.executable, os.path.join(source_dir, "main.py")], cwd=workdir, env=env)
+    deadline = time.monotonic() + 10.0
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("localhost", port), timeout=0.5).close()
+            if not unix_path or os.path.exists(unix_path):
+                return server
+        except OSError:
+            pass
+        time.sleep(0.1)
+    server.kill()
+    raise RuntimeError("server did not start")
+
+
+def replay(records, address, args, port: int, unix_path: str) -> dict:
+    with tempfile.TemporaryDirectory(prefix="replay-") as workdir:
+        server = spawn_server(port, unix_path, workdir) if args.spawn else None
+        try:
+            return Replayer(address, records, realtime=args.realtime).run()
+        finally:
+            if server:
+                server.send_signal(signal.SIGTERM)
+                server.wait(timeout=10.0)
+
+
+def log_report(transport: str, report: dict, realtime: bool):
+    logging.info(f"action: replay | result: success | transport: {transport} | "
+                 f"mode: {'realtime' if realtime else 'max_speed'} | "
+                 f"connections: {report['connections']} | messages: {report['messages']} | errors: {report['errors']} | "
+                 f"duration_s: {report['duration_s']:.3f} | messages_per_s: {report['messages_per_s']:.1f} | "
+                 f"bets_per_s: {report['bets_per_s']:.1f}")
+    for msg_type, stats in report['latency_ms'].items():
+        logging.info(f"action: replay_latency | result: success | transport: {transport} | type: {msg_type} | "
+                     f"count: {stats['count']} | p50_ms: {stats['p50']:.3f} | p95_ms: {stats['p95']:.3f} | "
+                     f"p99_ms: {stats['p99']:.3f} | max_ms: {stats['max']:.3f}")
+
+
+def main():
+    args = parse_args()
+    logging.basicConfig(format='%(asctime)s %(levelname)-8s %(message)s', level=logging.INFO, datefmt='%Y-%m-%d %H:%M:%S')
+
+    host, port = args.address.rsplit(':', 1)
+    records = list(read_trace(args.trace))
+    # El server lanzado con --spawn corre en otro directorio
+    unix_path = os.path.abspath(args.unix) if args.unix else None
+
+    targets = [('tcp', (host, int(port)))]
+    if unix_path:
+        targets.append(('unix', unix_path))
+
+    reports = {}
+    for transport, address in targets:
+        reports[transport] = replay(records, address, args, int(port), unix_path)
+        log_report(transport, reports[transport], args.realtime)
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(reports if args.unix else reports['tcp'], file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
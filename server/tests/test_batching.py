@@ -0,0 +1,35 @@
+from common.batching import BatchSizeAdvisor
+import unittest
+
+class TestBatchSizeAdvisor(unittest.TestCase):
+
+    def setUp(self):
+        self.contention = 0.0
+        self.advisor = BatchSizeAdvisor(8192, contention_fn=lambda: self.contention)
+
+    def test_recommended_without_measurements_must_be_zero(self):
+        self.assertEqual(0, self.advisor.recommended())
+
+    def test_adjust_must_recommend_what_fits_in_a_frame(self):
+        # 60 bytes por apuesta + 4 de longitud: (8192 * 0.9 - 4) // 64
+        self.advisor._adjust(batches=10, bet_bytes=60, avg_seconds=0.01, utilization=0.1, contention=0.0)
+        self.assertEqual(115, self.advisor.recommended())
+
+    def test_adjust_must_back_off_under_overload_and_recover(self):
+        self.advisor._adjust(10, 60, 0.01, 0.1, 0.0)
+        self.advisor._adjust(10, 60, 0.01, 0.9, 0.5)
+        self.assertEqual(86, self.advisor.recommended())
+
+        self.advisor._adjust(10, 60, 0.5, 0.9, 0.0)
+        self.assertEqual(64, self.advisor.recommended())
+
+        self.advisor._adjust(10, 60, 0.01, 0.7, 0.0)
+        self.assertEqual(80, self.advisor.recommended())
+
+    def test_record_must_adjust_once_per_interval(self):
+        self.advisor.ADJUST_INTERVAL = 0.0
+        self.advisor.record(bets=10, payload_size=644, seconds=0.01)
+        self.assertEqual(115, self.advisor.recommended())
+
+if __name__ == '__main__':
+    unittest.main()
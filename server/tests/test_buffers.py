@@ -0,0 +1,61 @@
+from common.buffers import BufferPool
+import threading
+import time
+import unittest
+
+class TestBufferPool(unittest.TestCase):
+
+    def setUp(self):
+        self.pool = BufferPool(budget=2 * 16, buffer_size=16)
+
+    def test_acquire_must_reuse_released_buffers(self):
+        buffer = self.pool.acquire()
+        self.pool.release(buffer)
+
+        self.assertIs(buffer, self.pool.acquire())
+
+    def test_acquire_must_block_while_budget_is_exhausted(self):
+        first = self.pool.acquire()
+        self.pool.acquire()
+        acquired = threading.Event()
+        threading.Thread(target=lambda: (self.pool.acquire(), acquired.set()), daemon=True).start()
+
+        self._wait_for(lambda: self.pool.usage()['waiting'] == 1)
+        self.assertFalse(acquired.is_set())
+
+        self.pool.release(first)
+        self.assertTrue(acquired.wait(timeout=1.0))
+        self.assertEqual(32, self.pool.usage()['in_use'])
+
+    def test_close_must_wake_waiting_connections(self):
+        self.pool.acquire()
+        self.pool.acquire()
+        errors = []
+        waiter = threading.Thread(target=lambda: self._acquire_into(errors), daemon=True)
+        waiter.start()
+        self._wait_for(lambda: self.pool.usage()['waiting'] == 1)
+
+        self.pool.close()
+        waiter.join(timeout=1.0)
+        self.assertEqual(1, len(errors))
+
+    def test_budget_smaller_than_a_buffer_must_still_allow_one(self):
+        pool = BufferPool(budget=1, buffer_size=16)
+        self.assertEqual(16, len(pool.acquire()))
+        self.assertEqual(16, pool.usage()['budget'])
+
+    def _acquire_into(self, errors):
+        try:
+            self.pool.acquire()
+        except RuntimeError as e:
+            errors.append(e)
+
+    def _wait_for(self, condition, timeout=2.0):
+        deadline = time.monotonic() + timeout
+        while not condition():
+            if time.monotonic() > deadline:
+                self.fail("condition not met")
+            time.sleep(0.01)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+from common.capture import Replayer, TrafficRecorder, read_trace
+from common.protocol import Protocol
+import os
+import socket
+import tempfile
+import threading
+import unittest
+
+class TestCapture(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'trace.bin')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_receive_message_must_record_messages_per_connection(self):
+        recorder = TrafficRecorder(self.path)
+        protocol = Protocol(recorder=recorder)
+        first, second = socket.socketpair(), socket.socketpair()
+        try:
+            for sender, receiver, payload in ((first[0], first[1], b'a'), (second[0], second[1], b'b'), (first[0], first[1], b'c')):
+                protocol.send_message(sender, Protocol.MSG_BATCH, payload)
+                protocol.receive_message(receiver)
+        finally:
+            for sock in first + second:
+                sock.close()
+        recorder.close()
+
+        records = list(read_trace(self.path))
+        self.assertEqual([b'a', b'b', b'c'], [record[3] for record in records])
+        self.assertEqual(records[0][1], records[2][1])
+        self.assertNotEqual(records[0][1], records[1][1])
+
+    def test_read_trace_must_skip_truncated_last_record(self):
+        recorder = TrafficRecorder(self.path)
+        a, b = socket.socketpair()
+        recorder.record(a, Protocol.MSG_BET, b'payload')
+        recorder.close()
+        a.close()
+        b.close()
+        with open(self.path, 'ab') as file:
+            file.write(b'\x00\x01')
+
+        self.assertEqual(1, len(list(read_trace(self.path))))
+
+    def test_replayer_must_report_messages_and_latency_per_type(self):
+        listener = socket.create_server(('localhost', 0))
+        threading.Thread(target=_ack_server, args=(listener,), daemon=True).start()
+        batch = b'\x00\x00\x00\x02'
+        records = [(0.0, 1, Protocol.MSG_BATCH, batch), (0.1, 2, Protocol.MSG_BATCH, batch), (0.2, 1, Protocol.MSG_FINISHED, b'x')]
+
+        report = Replayer(listener.getsockname(), records).run()
+        listener.close()
+
+        self.assertEqual(2, report['connections'])
+        self.assertEqual(3, report['messages'])
+        self.assertEqual(4, report['bets'])
+        self.assertEqual(0, report['errors'])
+        self.assertEqual(2, report['latency_ms'][Protocol.MSG_BATCH]['count'])
+
+    def test_replayer_must_connect_through_unix_socket(self):
+        path = os.path.join(self.tmp.name, 'server.sock')
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        listener.bind(path)
+        listener.listen(1)
+        threading.Thread(target=_ack_server, args=(listener,), daemon=True).start()
+
+        report = Replayer(path, [(0.0, 1, Protocol.MSG_BET, b'bet')]).run()
+        listener.close()
+
+        self.assertEqual(1, report['bets'])
+        self.assertEqual(0, report['errors'])
+
+
+def _ack_server(listener):
+    """Responde MSG_SUCCESS a cada mensaje, una conexión por thread"""
+    protocol = Protocol()
+
+    def serve(sock):
+        with sock:
+            while protocol.receive_message(sock):
+                protocol.send_message(sock, Protocol.MSG_SUCCESS, b'OK')
+
+    while True:
+        try:
+            sock, _ = listener.accept()
+        except OSError:
+            return
+        threading.Thread(target=serve, args=(sock,), daemon=True).start()
+
+if __name__ == '__main__':
+    unittest.main()
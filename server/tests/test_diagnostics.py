@@ -0,0 +1,50 @@
+from common.diagnostics import Diagnostics
+import os
+import tempfile
+import threading
+import tracemalloc
+import unittest
+
+class TestDiagnostics(unittest.TestCase):
+
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp()
+        self.diagnostics = Diagnostics(self.output_dir, profile_seconds=0.1)
+
+    def tearDown(self):
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def test_profile_must_sample_client_handler_threads(self):
+        stop = threading.Event()
+        handler = threading.Thread(target=stop.wait, name="client_handler_0")
+        handler.start()
+        try:
+            path = self.diagnostics.profile(0.1)
+        finally:
+            stop.set()
+            handler.join()
+
+        with open(path) as file:
+            content = file.read()
+        self.assertIn('wait', content)
+
+    def test_dump_stacks_must_include_thread_names(self):
+        path = self.diagnostics.dump_stacks()
+        with open(path) as file:
+            self.assertIn(threading.current_thread().name, file.read())
+
+    def test_tracemalloc_step_must_write_diff_and_stop_tracing(self):
+        self.assertIsNone(self.diagnostics.tracemalloc_step())
+        self.assertTrue(tracemalloc.is_tracing())
+
+        path = self.diagnostics.tracemalloc_step()
+        self.assertTrue(os.path.basename(path).startswith('tracemalloc-'))
+        self.assertFalse(tracemalloc.is_tracing())
+
+        # La señal siguiente empieza una sesión nueva
+        self.assertIsNone(self.diagnostics.tracemalloc_step())
+        self.assertTrue(tracemalloc.is_tracing())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+from common.handoff import HandoffListener, request_handoff
+import os
+import socket
+import tempfile
+import threading
+import unittest
+
+class TestHandoff(unittest.TestCase):
+
+    def setUp(self):
+        self.path = os.path.join(tempfile.mkdtemp(), 'handoff.sock')
+
+    def test_request_handoff_without_previous_process_must_return_none(self):
+        self.assertIsNone(request_handoff(self.path))
+
+    def test_request_handoff_must_receive_listening_socket_and_state(self):
+        listen_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        listen_socket.bind(('127.0.0.1', 0))
+        listen_socket.listen(1)
+        completed = threading.Event()
+        state = {'finished_agencies': ['1'], 'lottery_completed': False, 'storage_position': 42}
+
+        listener = HandoffListener(self.path, lambda: ([listen_socket], state), completed.set, lambda: None)
+        listener.start()
+
+        (inherited,), received_state = request_handoff(self.path)
+        try:
+            self.assertEqual(state, received_state)
+            self.assertEqual(listen_socket.getsockname(), inherited.getsockname())
+            self.assertTrue(completed.wait(timeout=1.0))
+        finally:
+            inherited.close()
+            listen_socket.close()
+
+    def test_request_handoff_must_keep_listeners_order(self):
+        tcp_socket = socket.create_server(('127.0.0.1', 0))
+        unix_path = os.path.join(os.path.dirname(self.path), 'server.sock')
+        unix_socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        unix_socket.bind(unix_path)
+        unix_socket.listen(1)
+
+        listener = HandoffListener(self.path, lambda: ([tcp_socket, unix_socket], {}), lambda: None, lambda: None)
+        listener.start()
+
+        inherited, _ = request_handoff(self.path)
+        try:
+            self.assertEqual([socket.AF_INET, socket.AF_UNIX], [sock.family for sock in inherited])
+            self.assertEqual(unix_path, inherited[1].getsockname())
+        finally:
+            for sock in inherited + [tcp_socket, unix_socket]:
+                sock.close()
+
+if __name__ == '__main__':
+    unittest.main()
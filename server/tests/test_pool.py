@@ -0,0 +1,59 @@
+from common.pool import ElasticPool
+import threading
+import time
+import unittest
+
+class TestElasticPool(unittest.TestCase):
+
+    def setUp(self):
+        self.contention = 0.0
+        self.release = threading.Event()
+        self.pool = ElasticPool(1, 3, "test_handler", contention_fn=lambda: self.contention)
+
+    def tearDown(self):
+        self.release.set()
+        self.pool.shutdown(wait=True, timeout=2.0)
+
+    def test_submit_must_return_future_with_result(self):
+        self.assertEqual(4, self.pool.submit(lambda x: x * 2, 2).result(timeout=1.0))
+
+    def test_submit_must_spawn_worker_when_none_is_idle(self):
+        for _ in range(4):
+            self.pool.submit(self.release.wait)
+        self._wait_for(lambda: self.pool._busy == 3)
+
+        self.assertEqual(3, self.pool.size)
+
+    def test_adjust_must_hold_when_storage_is_the_bottleneck(self):
+        self.contention = 1.0
+        self.pool._adjust()
+        self.pool.submit(self.release.wait)
+        self.pool.submit(self.release.wait)
+        self._wait_for(lambda: self.pool._busy == 1)
+        self.assertEqual(1, self.pool.size)
+
+        self.pool.MAX_HOLD = 0.0
+        self._wait_for(lambda: self.pool._oldest_wait() > self.pool.QUEUE_WAIT_TARGET)
+        self.pool._adjust()
+        self.assertEqual(2, self.pool.size)
+
+    def test_adjust_must_shrink_with_idle_workers(self):
+        pool = ElasticPool(1, 3, "test_idle")
+        try:
+            with pool._lock:
+                pool._spawn_worker()
+                pool._spawn_worker()
+            pool._adjust()
+            self.assertEqual(2, pool.size)
+        finally:
+            pool.shutdown(wait=True, timeout=2.0)
+
+    def _wait_for(self, condition, timeout=2.0):
+        deadline = time.monotonic() + timeout
+        while not condition():
+            if time.monotonic() > deadline:
+                self.fail("condition not met")
+            time.sleep(0.01)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,148 @@
+from common.buffers import BufferPool
+from common.protocol import Protocol
+from common.utils import Bet
+import socket
+import struct
+import unittest
+
+class TestProtocol(unittest.TestCase):
+
+    def setUp(self):
+        self.protocol = Protocol()
+        self.server_sock, self.client_sock = socket.socketpair()
+
+    def tearDown(self):
+        self.server_sock.close()
+        self.client_sock.close()
+
+    def test_send_message_must_be_received_with_same_type_and_payload(self):
+        self.assertTrue(self.protocol.send_message(self.server_sock, Protocol.MSG_RETRY, b'payload'))
+        msg_type, payload = self.protocol.receive_message(self.client_sock)
+
+        self.assertEqual(Protocol.MSG_RETRY, msg_type)
+        self.assertEqual(b'payload', payload)
+
+    def test_receive_message_must_reuse_header_buffer(self):
+        header = self.protocol._header_buffer()
+        self.protocol.send_message(self.server_sock, Protocol.MSG_RETRY, b'first')
+        self.protocol.send_message(self.server_sock, Protocol.MSG_SUCCESS, b'second')
+
+        self.assertEqual((Protocol.MSG_RETRY, b'first'), self.protocol.receive_message(self.client_sock))
+        self.assertEqual((Protocol.MSG_SUCCESS, b'second'), self.protocol.receive_message(self.client_sock))
+        self.assertIs(header, self.protocol._header_buffer())
+
+    def test_build_frame_must_match_send_message_bytes(self):
+        payload = self.protocol._encode_string("OK")
+        self.protocol.send_message(self.server_sock, Protocol.MSG_SUCCESS, payload)
+        frame = self.protocol.build_frame(Protocol.MSG_SUCCESS, payload)
+
+        self.assertEqual(frame, self.client_sock.recv(len(frame)))
+
+    def test_write_vectored_must_resume_after_partial_sends(self):
+        sock = _PartialSendSocket(chunk=3)
+        self.assertTrue(self.protocol._write_vectored(sock, (b'abcd', b'', b'efghij', b'k')))
+        self.assertEqual(b'abcdefghijk', bytes(sock.sent))
+
+    def test_send_finished_ack_must_send_prebuilt_frame(self):
+        self.protocol.send_finished_ack(self.server_sock, False)
+        msg_type, payload = self.protocol.receive_message(self.client_sock)
+
+        self.assertEqual(Protocol.MSG_ERROR, msg_type)
+        self.assertEqual('ERROR', self.protocol._decode_string(payload, 0)[0])
+
+    def test_encode_batches_must_split_at_max_message_size(self):
+        bets = [Bet('1', 'first', 'last', str(10000000 + i), '2000-12-20', 7500) for i in range(500)]
+        payloads = list(self.protocol.encode_batches(bets))
+
+        self.assertGreater(len(payloads), 1)
+        self.assertTrue(all(len(p) <= Protocol.MAX_MESSAGE_SIZE for p in payloads))
+        decoded = [bet for p in payloads for bet in self.protocol.decode_batch(bytes(p))]
+        self.assertEqual([b.document for b in bets], [b.document for b in decoded])
+
+    def test_decode_finished_without_stream_info_must_be_single_stream(self):
+        payload = self.protocol._encode_string('3')
+        self.assertEqual(('3', 0, 1), self.protocol.decode_finished(payload))
+
+    def test_decode_finished_must_keep_stream_index_and_count(self):
+        payload = self.protocol._encode_string('3') + struct.pack('!HH', 2, 4)
+        self.assertEqual(('3', 2, 4), self.protocol.decode_finished(payload))
+
+    def test_decode_finished_with_invalid_stream_must_fail(self):
+        payload = self.protocol._encode_string('3') + struct.pack('!HH', 4, 4)
+        with self.assertRaises(ValueError):
+            self.protocol.decode_finished(payload)
+
+    def test_send_winners_response_must_stream_bounded_chunks_and_terminator(self):
+        winners = (str(10000000 + i) for i in range(2000))
+        self.assertTrue(self.protocol.send_winners_response(self.server_sock, winners))
+
+        received = []
+        chunks = 0
+        msg_type, payload = self.protocol.receive_message(self.client_sock)
+        while msg_type == Protocol.MSG_WINNERS_CHUNK:
+            self.assertLessEqual(len(payload), Protocol.MAX_MESSAGE_SIZE)
+            count = struct.unpack_from('!I', payload, 0)[0]
+            offset = 4
+            for _ in range(count):
+                dni, offset = self.protocol._decode_string(payload, offset)
+                received.append(dni)
+            chunks += 1
+            msg_type, payload = self.protocol.receive_message(self.client_sock)
+
+        self.assertEqual(Protocol.MSG_WINNERS_END, msg_type)
+        self.assertEqual(2000, struct.unpack('!I', payload)[0])
+        self.assertGreater(chunks, 1)
+        self.assertEqual([str(10000000 + i) for i in range(2000)], received)
+
+    def test_send_winners_response_without_winners_must_send_only_terminator(self):
+        self.protocol.send_winners_response(self.server_sock, [])
+        msg_type, payload = self.protocol.receive_message(self.client_sock)
+
+        self.assertEqual(Protocol.MSG_WINNERS_END, msg_type)
+        self.assertEqual(0, struct.unpack('!I', payload)[0])
+
+    def test_receive_message_with_buffer_pool_must_decode_batch_and_release_buffer(self):
+        pool = BufferPool(Protocol.MAX_MESSAGE_SIZE + 1, Protocol.MAX_MESSAGE_SIZE + 1)
+        protocol = Protocol(buffer_pool=pool)
+        bets = [Bet('1', 'Ana', 'Paz', '30904465', '1999-03-17', '7574')]
+        protocol.send_message(self.server_sock, Protocol.MSG_BATCH, bytes(next(protocol.encode_batches(bets))))
+
+        msg_type, payload = protocol.receive_message(self.client_sock)
+        self.assertEqual(Protocol.MSG_BATCH, msg_type)
+        self.assertIsInstance(payload, memoryview)
+        self.assertEqual(Protocol.MAX_MESSAGE_SIZE + 1, pool.usage()['in_use'])
+        self.assertEqual('30904465', protocol.decode_batch(payload)[0].document)
+
+        protocol.release_payload(payload)
+        self.assertEqual(0, pool.usage()['in_use'])
+
+    def test_receive_message_with_buffer_pool_must_release_buffer_on_invalid_delimiter(self):
+        pool = BufferPool(Protocol.MAX_MESSAGE_SIZE + 1, Protocol.MAX_MESSAGE_SIZE + 1)
+        protocol = Protocol(buffer_pool=pool)
+        self.server_sock.sendall(struct.pack('!IB', 2, Protocol.MSG_BET) + b'ab\x00')
+
+        self.assertIsNone(protocol.receive_message(self.client_sock))
+        self.assertEqual(0, pool.usage()['in_use'])
+
+    def test_encode_response_must_append_recommended_batch_only_when_positive(self):
+        plain = self.protocol.encode_response("30904465", "7574")
+        advised = self.protocol.encode_response("30904465", "7574", recommended_batch=120)
+
+        self.assertEqual(plain + struct.pack('!H', 120), advised)
+        self.assertEqual(plain, self.protocol.encode_response("30904465", "7574", recommended_batch=0))
+
+
+class _PartialSendSocket:
+    """Socket falso que acepta como máximo 'chunk' bytes por llamada"""
+
+    def __init__(self, chunk):
+        self.chunk = chunk
+        self.sent = bytearray()
+
+    def sendmsg(self, buffers):
+        data = b"".join(bytes(buf) for buf in buffers)[:self.chunk]
+        self.sent += data
+        return len(data)
+
+if __name__ == '__main__':
+    unittest.main()
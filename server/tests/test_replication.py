@@ -0,0 +1,137 @@
+from common.follower import FollowerServer
+from common.protocol import Protocol
+from common.replication import ReplicationPublisher
+from common.utils import LOTTERY_WINNER_NUMBER, Bet
+import socket
+import struct
+import threading
+import unittest
+
+class TestReplicationPublisher(unittest.TestCase):
+
+    def setUp(self):
+        self.protocol = Protocol()
+        self.primary_sock, self.replica_sock = socket.socketpair()
+        self.publisher = None
+
+    def tearDown(self):
+        if self.publisher:
+            self.publisher.stop()
+        self.replica_sock.close()
+
+    def _publisher(self, snapshot, **kwargs):
+        self.publisher = ReplicationPublisher(0, 1, threading.Lock(), self.protocol, snapshot_fn=lambda: snapshot, **kwargs)
+        return self.publisher
+
+    def _receive(self):
+        msg_type, payload = self.protocol.receive_message(self.replica_sock)
+        if msg_type == Protocol.MSG_BATCH:
+            return msg_type, [bet.document for bet in self.protocol.decode_batch(payload)]
+        return msg_type, self.protocol._decode_string(payload, 0)[0]
+
+    def test_follower_must_receive_snapshot_then_live_records_in_order(self):
+        publisher = self._publisher(iter([_bet(1, '1', 10), _bet(2, '2', 20)]), finished=['2'])
+        publisher._add_follower(self.primary_sock)
+        publisher.publish_bets([_bet(1, '3', 30)])
+        publisher.publish_finished('1')
+
+        self.assertEqual((Protocol.MSG_BATCH, ['1', '2']), self._receive())
+        self.assertEqual((Protocol.MSG_FINISHED, '2'), self._receive())
+        self.assertEqual((Protocol.MSG_BATCH, ['3']), self._receive())
+        self.assertEqual((Protocol.MSG_FINISHED, '1'), self._receive())
+
+    def test_publish_without_followers_must_not_encode_but_keep_finished(self):
+        publisher = self._publisher(iter([]))
+        encoded = []
+        self.protocol.encode_batches = lambda bets: encoded.append(bets) or []
+        publisher.publish_bets([_bet(1, '1', 10)])
+        publisher.publish_finished('1')
+        self.assertEqual([], encoded)
+
+        publisher._add_follower(self.primary_sock)
+        self.assertEqual((Protocol.MSG_FINISHED, '1'), self._receive())
+
+    def test_live_bets_must_be_encoded_by_the_follower_thread(self):
+        publisher = self._publisher(iter([]))
+        publisher._add_follower(self.primary_sock)
+        encode_batches = self.protocol.encode_batches
+        encoding_threads = []
+
+        def recording_encode(bets):
+            encoding_threads.append(threading.current_thread())
+            return encode_batches(bets)
+
+        self.protocol.encode_batches = recording_encode
+        publisher.publish_bets([_bet(1, '1', 10)])
+
+        self.assertEqual((Protocol.MSG_BATCH, ['1']), self._receive())
+        self.assertNotIn(threading.current_thread(), encoding_threads)
+
+    def test_lagging_follower_must_be_disconnected(self):
+        release = threading.Event()
+
+        def slow_snapshot():
+            release.wait(timeout=5.0)
+            yield _bet(1, '1', 10)
+
+        publisher = self._publisher(slow_snapshot(), max_pending=1)
+        publisher._add_follower(self.primary_sock)
+        publisher.publish_bets([_bet(1, '2', 10)])
+        publisher.publish_bets([_bet(1, '3', 10)])
+        release.set()
+
+        self.assertEqual([], publisher._followers)
+        self.replica_sock.settimeout(1.0)
+        self.assertEqual(b'', self.replica_sock.recv(1))
+
+
+class TestFollowerServer(unittest.TestCase):
+
+    def setUp(self):
+        self.protocol = Protocol()
+        self.follower = FollowerServer(0, 1, 'localhost:1')
+        self.follower._expected_agencies = 2
+        self.client_sock, server_sock = socket.socketpair()
+        self.handler = threading.Thread(target=self.follower._handle_client_connection, args=(server_sock,), daemon=True)
+        self.handler.start()
+
+    def tearDown(self):
+        self.client_sock.close()
+        self.handler.join(timeout=1.0)
+        self.follower._thread_pool.shutdown(wait=False)
+        self.follower._server_socket.close()
+
+    def _apply(self, msg_type, payload):
+        # El mismo frame que recibiría desde el primario
+        self.follower._apply(msg_type, bytes(payload))
+
+    def _query(self, agency_id):
+        self.protocol.send_message(self.client_sock, Protocol.MSG_WINNERS_QUERY, self.protocol._encode_string(agency_id))
+        winners = []
+        msg_type, payload = self.protocol.receive_message(self.client_sock)
+        while msg_type == Protocol.MSG_WINNERS_CHUNK:
+            offset = 4
+            for _ in range(struct.unpack_from('!I', payload, 0)[0]):
+                dni, offset = self.protocol._decode_string(payload, offset)
+                winners.append(dni)
+            msg_type, payload = self.protocol.receive_message(self.client_sock)
+        return msg_type, winners
+
+    def test_follower_must_retry_until_every_agency_finished_and_then_answer(self):
+        bets = [_bet(1, '1', LOTTERY_WINNER_NUMBER), _bet(1, '2', 10), _bet(2, '3', LOTTERY_WINNER_NUMBER)]
+        for payload in self.protocol.encode_batches(bets):
+            self._apply(Protocol.MSG_BATCH, payload)
+        self._apply(Protocol.MSG_FINISHED, self.protocol._encode_string('1'))
+
+        self.assertEqual((Protocol.MSG_RETRY, []), self._query('1'))
+
+        self._apply(Protocol.MSG_FINISHED, self.protocol._encode_string('2'))
+        self.assertEqual((Protocol.MSG_WINNERS_END, ['1']), self._query('1'))
+        self.assertEqual((Protocol.MSG_WINNERS_END, ['3']), self._query('2'))
+
+
+def _bet(agency, document, number):
+    return Bet(str(agency), 'first', 'last', document, '2000-12-20', str(number))
+
+if __name__ == '__main__':
+    unittest.main()
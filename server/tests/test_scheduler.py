@@ -0,0 +1,84 @@
+from common.scheduler import BatchScheduler
+import threading
+import time
+import unittest
+
+class TestBatchScheduler(unittest.TestCase):
+
+    def setUp(self):
+        self.stored = []
+        self.scheduler = BatchScheduler(self.stored.append, quantum=2)
+        self.threads = []
+
+    def tearDown(self):
+        self.scheduler.stop()
+        for thread in self.threads:
+            thread.join(timeout=1.0)
+
+    def test_small_agency_is_interleaved_with_big_agency(self):
+        for i in range(3):
+            self._submit_and_wait('1', [f'big_{i}_a', f'big_{i}_b'])
+        self._submit_and_wait('5', ['small_a', 'small_b'])
+
+        self.scheduler.start()
+        self._wait_for(lambda: not self.scheduler.queue_depths() and len(self.stored) >= 1)
+        for thread in self.threads:
+            thread.join(timeout=1.0)
+
+        flat = [bet for stored in self.stored for bet in stored]
+        self.assertEqual(8, len(flat))
+        # La agencia chica se almacena en la primera ronda, no detrás de toda la grande
+        self.assertLess(flat.index('small_a'), flat.index('big_1_a'))
+
+    def test_weights_give_more_bets_per_round(self):
+        scheduler = BatchScheduler(self.stored.append, quantum=1, weights={'1': 2})
+        self.scheduler = scheduler
+        self._submit_and_wait('1', ['a', 'b'])
+
+        scheduler.start()
+        self.threads[0].join(timeout=1.0)
+
+        self.assertEqual([['a', 'b']], self.stored)
+        stats = scheduler.agency_stats('1')
+        self.assertEqual(1, stats['batches'])
+        self.assertEqual(2.0, stats['bets_per_round'])
+        self.assertGreater(stats['p95_wait_ms'], 0.0)
+
+    def test_non_positive_quantum_and_weights_must_still_store(self):
+        scheduler = BatchScheduler(self.stored.append, quantum=0, weights={'1': 0, '2': -3})
+        self.scheduler = scheduler
+        self._submit_and_wait('1', ['a', 'b'])
+        self._submit_and_wait('2', ['c'])
+
+        scheduler.start()
+        for thread in self.threads:
+            thread.join(timeout=1.0)
+            self.assertFalse(thread.is_alive())
+        self.assertEqual(['a', 'b', 'c'], sorted(bet for stored in self.stored for bet in stored))
+
+    def test_store_error_is_raised_to_submitter(self):
+        def failing_store(bets):
+            raise IOError("disk full")
+        scheduler = BatchScheduler(failing_store)
+        self.scheduler = scheduler
+        scheduler.start()
+
+        with self.assertRaises(IOError):
+            scheduler.submit('1', ['a'])
+
+    def _submit_and_wait(self, agency, bets):
+        expected = self.scheduler.queue_depths().get(agency, 0) + 1
+        thread = threading.Thread(target=self.scheduler.submit, args=(agency, bets))
+        thread.start()
+        self.threads.append(thread)
+        self._wait_for(lambda: self.scheduler.queue_depths().get(agency, 0) == expected)
+
+    def _wait_for(self, condition, timeout=2.0):
+        deadline = time.monotonic() + timeout
+        while not condition():
+            if time.monotonic() > deadline:
+                self.fail("condition not met")
+            time.sleep(0.01)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+from common.segments import SegmentStore
+from common.utils import STORAGE_FILEPATH, Bet, store_bets
+import os
+import tempfile
+import threading
+import unittest
+
+class TestSegmentStore(unittest.TestCase):
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmp = tempfile.TemporaryDirectory()
+        os.chdir(self.tmp.name)
+        self.store = SegmentStore('segments', threading.Lock(), threshold=1)
+        self.store.open(clear=True)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def test_compact_must_keep_arrival_order_within_agency(self):
+        store_bets([_bet(2, '1', 10), _bet(1, '2', 20), _bet(2, '3', 30), _bet(1, '4', 40)])
+        self.store.compact()
+
+        self.assertFalse(os.path.exists(STORAGE_FILEPATH))
+        self.assertEqual({'segments': 1, 'sealed': 0}, self.store.stats())
+        self.assertEqual(['2', '4', '1', '3'], [bet.document for bet in self.store.iter_bets()])
+        self.assertEqual(['1', '3'], [bet.document for bet in self.store.iter_bets(agency=2)])
+
+    def test_iter_bets_must_include_active_file_after_segments(self):
+        store_bets([_bet(1, '1', 10)])
+        self.store.compact()
+        store_bets([_bet(1, '2', 10), _bet(3, '3', 10)])
+
+        self.assertEqual(['1', '2'], [bet.document for bet in self.store.iter_bets(agency=1)])
+
+    def test_iter_bets_must_skip_segments_without_agency_or_number(self):
+        store_bets([_bet(1, '1', 10), _bet(1, '2', 20)])
+        self.store.compact()
+        store_bets([_bet(2, '3', 7574)])
+        self.store.compact()
+
+        segments = self.store._segments
+        self.assertFalse(segments[0].may_contain(2, None))
+        self.assertFalse(segments[0].may_contain(1, 7574))
+        self.assertTrue(segments[1].may_contain(2, 7574))
+        self.assertEqual(['3'], [bet.document for bet in self.store.iter_bets(number=7574)])
+
+    def test_open_without_clear_must_load_segments_and_recover_sealed(self):
+        store_bets([_bet(1, '1', 10)])
+        self.store.compact()
+        store_bets([_bet(1, '2', 10)])
+        self.store._seal(force=True)
+
+        reopened = SegmentStore('segments', threading.Lock(), threshold=1)
+        reopened.open(clear=False)
+        self.assertEqual({'segments': 1, 'sealed': 1}, reopened.stats())
+        reopened.compact()
+        self.assertEqual(['1', '2'], [bet.document for bet in reopened.iter_bets(agency=1)])
+
+    def test_snapshot_must_ignore_bets_stored_after_it(self):
+        store_bets([_bet(1, '1', 10)])
+        self.store.compact()
+        store_bets([_bet(2, '2', 10)])
+
+        snapshot = self.store.snapshot()
+        store_bets([_bet(3, '3', 10)])
+        self.store.compact(force=True)
+
+        self.assertEqual(['1', '2'], [bet.document for bet in snapshot])
+        self.assertEqual(['1', '2', '3'], [bet.document for bet in self.store.iter_bets()])
+
+
+def _bet(agency, document, number):
+    return Bet(str(agency), 'first', 'last', document, '2000-12-20', str(number))
+
+if __name__ == '__main__':
+    unittest.main()
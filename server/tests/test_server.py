@@ -0,0 +1,86 @@
+from common.protocol import Protocol
+from common.server import Server
+import os
+import socket
+import struct
+import tempfile
+import threading
+import unittest
+
+class TestUnixListener(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, 'server.sock')
+        # Solo se prueba el bind del listener, sin levantar el resto del server
+        self.server = Server.__new__(Server)
+        self.sockets = []
+
+    def tearDown(self):
+        for sock in self.sockets:
+            sock.close()
+        self.dir.cleanup()
+
+    def _listen(self, path):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.bind(path)
+        sock.listen(1)
+        self.sockets.append(sock)
+        return sock
+
+    def test_bind_must_replace_stale_socket(self):
+        self._listen(self.path).close()
+
+        self.sockets.append(self.server._bind_unix_socket(self.path, 1))
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            client.connect(self.path)
+
+    def test_bind_must_not_delete_regular_file(self):
+        with open(self.path, 'w') as file:
+            file.write('bets')
+
+        with self.assertRaises(FileExistsError):
+            self.server._bind_unix_socket(self.path, 1)
+        with open(self.path) as file:
+            self.assertEqual('bets', file.read())
+
+    def test_bind_must_not_steal_socket_in_use(self):
+        self._listen(self.path)
+
+        with self.assertRaises(FileExistsError):
+            self.server._bind_unix_socket(self.path, 1)
+
+
+class TestWinnersQuery(unittest.TestCase):
+
+    def setUp(self):
+        self.protocol = Protocol()
+        # Solo el estado que usa el handler para contestar consultas de ganadores
+        self.server = Server.__new__(Server)
+        self.server._protocol = self.protocol
+        self.server._draining = threading.Event()
+        self.server._state_lock = threading.Lock()
+        self.server._connections_lock = threading.Lock()
+        self.server._active_connections = []
+        self.server._finished_agencies = {'1'}
+        self.server._expected_agencies = 1
+        self.server._lottery_completed = True
+        self.client_sock, server_sock = socket.socketpair()
+        self.handler = threading.Thread(target=self.server._Server__handle_client_connection, args=(server_sock,), daemon=True)
+        self.handler.start()
+
+    def tearDown(self):
+        self.client_sock.close()
+        self.handler.join(timeout=1.0)
+
+    def test_query_with_invalid_agency_must_answer_empty_stream(self):
+        self.server._iter_winners_for_agency = lambda agency_id: self.fail('stream started')
+        self.protocol.send_message(self.client_sock, Protocol.MSG_WINNERS_QUERY, self.protocol._encode_string('abc'))
+        self.client_sock.settimeout(1.0)
+        msg_type, payload = self.protocol.receive_message(self.client_sock)
+
+        self.assertEqual(Protocol.MSG_WINNERS_END, msg_type)
+        self.assertEqual(0, struct.unpack('!I', payload)[0])
+
+if __name__ == '__main__':
+    unittest.main()